@@ -0,0 +1,183 @@
+import os
+import sys
+import mmap
+import struct
+import argparse
+from replay import encode_game, parse_entries, read_replays, NO_WINNER
+
+MAGIC = b"BSAR"
+FORMAT_VERSION = 1
+# magic, format version, number of games
+HEADER = struct.Struct("<4sBxxxI")
+# game id, offset of the game data from the start of the file, its length, number of moves, winner
+INDEX_ENTRY = struct.Struct("<QQIHBx")
+
+
+class ArchiveException(Exception):
+    """Exception indicating that the archive is malformed"""
+    pass
+
+
+def build_archive(path, records, first_id=0):
+    """Write game records into a new archive. Games get consecutive ids starting from first_id,
+       unless given as (game id, record) pairs. Index is kept sorted by game id.
+    """
+    games = []
+    for number, item in enumerate(records):
+        game_id, record = item if isinstance(item, tuple) else (first_id + number, item)
+        games.append((game_id, record))
+    games.sort(key=lambda game: game[0])
+
+    offset = HEADER.size + INDEX_ENTRY.size * len(games)
+    index = bytearray()
+    bodies = []
+    for game_id, record in games:
+        body = encode_game(record)
+        winner = NO_WINNER if record.winner is None else record.winner
+        index += INDEX_ENTRY.pack(game_id, offset, len(body), len(record.moves), winner)
+        bodies.append(body)
+        offset += len(body)
+    with open(path, "wb") as archive_file:
+        archive_file.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(games)))
+        archive_file.write(index)
+        for body in bodies:
+            archive_file.write(body)
+
+
+class IndexEntry():
+    """Index entry of a single game"""
+    __slots__ = ("game_id", "offset", "length", "moves", "winner")
+
+    def __init__(self, game_id, offset, length, moves, winner):
+        self.game_id = game_id
+        self.offset = offset
+        self.length = length
+        self.moves = moves
+        self.winner = None if winner == NO_WINNER else winner
+
+
+class GameArchive():
+    """Read-only archive of game records, opened via mmap.
+       Index entries have a fixed size, so any game can be found without reading the others,
+       and game data is handed out as memoryview slices of the mapping, without copying.
+    """
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise ArchiveException("Empty archive file!")
+        self.data = memoryview(self.map)
+        if len(self.data) < HEADER.size:
+            self.close()
+            raise ArchiveException("Not a game archive!")
+        magic, version, self.count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version > FORMAT_VERSION:
+            self.close()
+            raise ArchiveException("Not a game archive or unsupported version!")
+
+
+    def __len__(self):
+        return self.count
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+    def close(self):
+        if self.data is not None:
+            self.data.release()
+            self.data = None
+            self.map.close()
+            self.file.close()
+
+
+    def entry(self, number):
+        """Index entry of the game with the given position in the archive
+        """
+        if not 0 <= number < self.count:
+            raise IndexError("Game number out of range")
+        return IndexEntry(*INDEX_ENTRY.unpack_from(self.data, HEADER.size + number * INDEX_ENTRY.size))
+
+
+    def entries(self):
+        for fields in INDEX_ENTRY.iter_unpack(self.data[HEADER.size:HEADER.size + self.count * INDEX_ENTRY.size]):
+            yield IndexEntry(*fields)
+
+
+    def find(self, game_id):
+        """Position of the game with the given id, found by binary search of the index. None if missing.
+        """
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            current = INDEX_ENTRY.unpack_from(self.data, HEADER.size + middle * INDEX_ENTRY.size)[0]
+            if current < game_id:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count and INDEX_ENTRY.unpack_from(self.data, HEADER.size + low * INDEX_ENTRY.size)[0] == game_id:
+            return low
+        return None
+
+
+    def raw(self, number):
+        """Replay entries of the game, as a memoryview of the mapped file
+        """
+        entry = self.entry(number)
+        return self.data[entry.offset:entry.offset + entry.length]
+
+
+    def game(self, number):
+        """Parsed GameRecord of the game with the given position in the archive
+        """
+        return next(parse_entries(self.raw(number)))
+
+
+    def game_by_id(self, game_id):
+        number = self.find(game_id)
+        return None if number is None else self.game(number)
+
+
+    def scan(self, winner=None, min_moves=0, max_moves=None):
+        """Generate index entries of the games matching the criteria, without touching game data
+        """
+        for entry in self.entries():
+            if winner is not None and entry.winner != winner:
+                continue
+            if entry.moves < min_moves or (max_moves is not None and entry.moves > max_moves):
+                continue
+            yield entry
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build and inspect archives of recorded games')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build', help='build archive from replay files')
+    build_parser.add_argument('archive', type=str, help='archive file to create')
+    build_parser.add_argument('replays', type=str, nargs='+', help='replay files')
+    stats_parser = subparsers.add_parser('stats', help='summarize games stored in the archive')
+    stats_parser.add_argument('archive', type=str, help='archive file')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        records = [record for path in args.replays for record in read_replays(path)]
+        build_archive(args.archive, records)
+        print(f"Archived {len(records)} games in {args.archive} ({os.path.getsize(args.archive)} bytes)")
+        sys.exit(0)
+
+    with GameArchive(args.archive) as archive:
+        wins = [0, 0]
+        moves = 0
+        for entry in archive.entries():
+            moves += entry.moves
+            if entry.winner is not None:
+                wins[entry.winner] += 1
+        print(f"Games: {len(archive)}, won by first: {wins[0]}, won by second: {wins[1]}, "
+              f"average moves: {moves / len(archive) if len(archive) else 0:.2f}")
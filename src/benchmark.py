@@ -0,0 +1,266 @@
+import sys
+import json
+import time
+import random
+import socket
+import tempfile
+import platform
+import argparse
+import threading
+import board
+import protocol
+from server import BotPlayer, quiet
+from checkpoint import Checkpoint
+
+DEFAULT_TOLERANCE = 0.25
+
+
+# Every benchmark takes the number of operations to perform and returns the time they took,
+# so that the setup is left out of the measurement.
+
+def bench_insert(ops):
+    player_board = board.Board()
+    cells = [(idx // board.BOARD_COLS + 1, idx % board.BOARD_COLS + 1) for idx in range(board.BOARD_ROWS * board.BOARD_COLS)]
+    start = time.perf_counter()
+    for number in range(ops):
+        row, col = cells[number % len(cells)]
+        player_board.insert(row, col)
+    return time.perf_counter() - start
+
+
+def bench_is_ship_available(ops):
+    rng = random.Random(1)
+    player_board = board.Board()
+    player_board.init_ships("random")
+    queries = []
+    for _ in range(1000):
+        length, row, col, orientation = rng.choice(list(board.PLACEMENT_MASKS))
+        end_row, end_col = (row, col + length - 1) if orientation == "horizontal" else (row + length - 1, col)
+        queries.append(((row, col, end_row, end_col), length))
+    start = time.perf_counter()
+    for number in range(ops):
+        player_board.is_ship_available(*queries[number % len(queries)])
+    return time.perf_counter() - start
+
+
+def bench_init_ships_random(ops):
+    start = time.perf_counter()
+    for _ in range(ops):
+        board.Board().init_ships("random")
+    return time.perf_counter() - start
+
+
+def bench_generate_fleets(ops):
+    start = time.perf_counter()
+    board.generate_fleets(ops, seed=1)
+    return time.perf_counter() - start
+
+
+def bench_is_hit(ops):
+    cells = board.Board.generate_all_fields_list()
+    boards = []
+    for _ in range(ops // len(cells) + 1):
+        player_board = board.Board()
+        player_board.init_ships("random")
+        boards.append(player_board)
+    start = time.perf_counter()
+    for number in range(ops):
+        boards[number // len(cells)].is_hit(cells[number % len(cells)])
+    return time.perf_counter() - start
+
+
+def bench_render(renderer):
+    def bench(ops):
+        rng = random.Random(2)
+        player_board = board.Board()
+        player_board.set_renderer(renderer)
+        player_board.init_ships("random")
+        changes = [(1 << rng.randrange(board.BOARD_ROWS * board.BOARD_COLS), rng.choice((board.HIT_SYMBOL, board.MISSED_SYMBOL)))
+                   for _ in range(1000)]
+        start = time.perf_counter()
+        for number in range(ops):
+            player_board.set_cells(*changes[number % len(changes)])
+            player_board.get_board_print_lines()
+        return time.perf_counter() - start
+    return bench
+
+
+class QuietBot(BotPlayer):
+    """Bot playing without any output"""
+    def __init__(self):
+        super(QuietBot, self).__init__(log_method=quiet)
+        self.log_boards = False
+
+
+    def display_prompt(self, actor="Me"):
+        pass
+
+
+def bench_bot_move(ops):
+    """Move of the bot: choosing the shot in daemon_response and handling its result
+    """
+    elapsed = 0.0
+    done = 0
+    while done < ops:
+        bot = QuietBot()
+        bot.initialize_game(init_ships_method="random")
+        opponent = board.Board()
+        opponent.init_ships("random")
+        start = time.perf_counter()
+        while done < ops and opponent.ship_count:
+            guess = bot.daemon_response()
+            hit = opponent.shoot_cell(board.COORDINATE_CELLS[guess])
+            bot.handle_received_msg("hit" if hit else "missed")
+            if opponent.last_sunk is not None:
+                bot.handle_received_msg(protocol.sunk_message(opponent.last_sunk[0]))
+            bot.writer.pending.clear()
+            done += 1
+        elapsed += time.perf_counter() - start
+    return elapsed
+
+
+def bench_round_trip(ops):
+    """Shot sent over the loopback TCP connection and its result received back
+    """
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1)
+
+    def answer():
+        conn, addr = listener.accept()
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        player_board = board.Board()
+        player_board.init_ships("random")
+        reader, writer = protocol.MessageReader(), protocol.MessageWriter()
+        while True:
+            messages = reader.recv(conn)
+            if messages is None:
+                break
+            for message in messages:
+                if player_board.ship_count == 0:
+                    player_board = board.Board()
+                    player_board.init_ships("random")
+                writer.write("hit" if player_board.is_hit(message) else "missed")
+            writer.flush(conn)
+        conn.close()
+
+    thread = threading.Thread(target=answer, daemon=True)
+    thread.start()
+    client = socket.create_connection(listener.getsockname())
+    client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    reader = protocol.MessageReader()
+    cells = [f"{name}\n".encode(protocol.ENCODING) for name in board.CELL_NAMES]
+    start = time.perf_counter()
+    for number in range(ops):
+        client.sendall(cells[number % len(cells)])
+        while not reader.recv(client):
+            pass
+    elapsed = time.perf_counter() - start
+    client.close()
+    thread.join()
+    listener.close()
+    return elapsed
+
+
+def bench_checkpoint_save(ops):
+    """Snapshot of a game in progress written to its checkpoint, as done after every move
+    """
+    bot = QuietBot()
+    bot.initialize_game(init_ships_method="random")
+    bot.writer.pending.clear()
+    bot.game_id = 1
+    opponent = board.Board()
+    opponent.init_ships("random")
+    for _ in range(30):
+        guess = bot.daemon_response()
+        bot.handle_received_msg("hit" if opponent.shoot_cell(board.COORDINATE_CELLS[guess]) else "missed")
+    with tempfile.TemporaryDirectory() as directory:
+        bot.checkpoint = Checkpoint(f"{directory}/game.bsc")
+        start = time.perf_counter()
+        for _ in range(ops):
+            bot.checkpoint.save(bot.snapshot())
+        elapsed = time.perf_counter() - start
+        bot.checkpoint.close()
+    return elapsed
+
+
+# name -> (benchmark, number of operations per run)
+BENCHMARKS = {
+    "board_insert": (bench_insert, 20000),
+    "is_ship_available": (bench_is_ship_available, 20000),
+    "init_ships_random": (bench_init_ships_random, 2000),
+    "generate_fleets": (bench_generate_fleets, 20000),
+    "is_hit": (bench_is_hit, 20000),
+    "render_text": (bench_render(board.RENDERERS["plain"]), 5000),
+    "bot_move": (bench_bot_move, 2000),
+    "round_trip": (bench_round_trip, 2000),
+    "checkpoint_save": (bench_checkpoint_save, 20000),
+}
+if board.PrettyTable is not None:
+    BENCHMARKS["render_prettytable"] = (bench_render(board.RENDERERS["prettytable"]), 200)
+
+
+def run_benchmarks(names=None, repeat=5, scale=1.0, progress=None):
+    """Run the benchmarks, best of repeat runs. Returns machine-readable results:
+       name -> {"ops": operations per run, "us_per_op": microseconds per operation}
+    """
+    results = dict()
+    for name in names or BENCHMARKS:
+        bench, ops = BENCHMARKS[name]
+        ops = max(1, int(ops * scale))
+        best = min(bench(ops) for _ in range(repeat))
+        results[name] = {"ops": ops, "us_per_op": best / ops * 1e6}
+        if progress is not None:
+            progress(name, results[name])
+    return results
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Compare results with the baseline ones. Returns list of (name, baseline, current, ratio)
+       of the benchmarks slower than the baseline by more than the tolerance.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before, now = baseline[name]["us_per_op"], result["us_per_op"]
+        ratio = now / before if before else float("inf")
+        if ratio > 1 + tolerance:
+            regressions.append((name, before, now, ratio))
+    return regressions
+
+
+def environment():
+    return {"python": platform.python_version(), "implementation": platform.python_implementation(),
+            "machine": platform.machine()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Measure speed of the board, bot and network hot paths')
+    parser.add_argument('-b', '--benchmarks', type=str, nargs='+', default=None, choices=BENCHMARKS.keys(), help='benchmarks to run, all by default')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='number of runs of every benchmark, the best one counts')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiplier of the number of operations per run')
+    parser.add_argument('--json', type=str, default=None, help='write results to the given file, - for stdout')
+    parser.add_argument('--baseline', type=str, default=None, help='compare results with the ones stored in the given file')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='allowed slowdown against the baseline, 0.25 is 25%%')
+    args = parser.parse_args()
+
+    progress = None if args.json == "-" else lambda name, result: print(f"{name:>20} {result['us_per_op']:>12.3f} us/op")
+    results = run_benchmarks(args.benchmarks, args.repeat, args.scale, progress)
+    report = {"environment": environment(), "results": results}
+    if args.json == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    elif args.json:
+        with open(args.json, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results, baseline["results"], args.tolerance)
+        for name, before, now, ratio in regressions:
+            print(f"REGRESSION {name}: {before:.3f} -> {now:.3f} us/op ({ratio:.2f}x)", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}", file=sys.stderr)
@@ -0,0 +1,96 @@
+import asyncio
+import protocol
+
+WATCH = "watch"
+GAMES = "games"
+# bytes waiting in the transport of a spectator, above which the spectator is dropped
+MAX_SPECTATOR_BUFFER = 64 * 1024
+
+
+class Broadcast():
+    """Fans the messages of a single game out to any number of spectators.
+       Every message is sent as a line "<player> <message>", player being 0 or 1.
+       Messages published during one pass of the event loop are encoded once and sent
+       to every spectator with a single write. Spectators never slow the game down:
+       writes are not awaited, and a spectator whose unsent data exceeds max_buffer is dropped.
+       Spectators joining late get the whole game so far first.
+    """
+    def __init__(self, max_buffer=MAX_SPECTATOR_BUFFER):
+        self.max_buffer = max_buffer
+        self.spectators = set()
+        self.history = bytearray()
+        self.pending = []
+        self.scheduled = False
+        self.finished = False
+        self.dropped = 0
+
+
+    def subscribe(self, writer):
+        self.flush()
+        if self.history:
+            writer.write(bytes(self.history))
+        if self.finished:
+            writer.close()
+        else:
+            self.spectators.add(writer)
+
+
+    def unsubscribe(self, writer):
+        self.spectators.discard(writer)
+
+
+    def publish(self, player, message):
+        self.pending.append(f"{player} {message}")
+        if not self.scheduled:
+            self.scheduled = True
+            asyncio.get_running_loop().call_soon(self.flush)
+
+
+    def publish_all(self, player, messages):
+        for message in messages:
+            self.publish(player, message)
+
+
+    def flush(self):
+        self.scheduled = False
+        if not self.pending:
+            return
+        data = protocol.encode_messages(self.pending)
+        self.pending.clear()
+        self.history += data
+        for writer in list(self.spectators):
+            if writer.is_closing():
+                self.spectators.discard(writer)
+            elif writer.transport.get_write_buffer_size() + len(data) > self.max_buffer:
+                # slow consumer, do not let its backlog grow
+                self.spectators.discard(writer)
+                self.dropped += 1
+                writer.close()
+            else:
+                writer.write(data)
+
+
+    def close(self):
+        """Send the rest of the game and disconnect the spectators
+        """
+        self.flush()
+        self.finished = True
+        for writer in self.spectators:
+            writer.close()
+        self.spectators.clear()
+
+
+class BroadcastReader():
+    """Keeps track of the messages passing through a relay in one direction and publishes them"""
+    def __init__(self, broadcast, player):
+        self.broadcast = broadcast
+        self.player = player
+        self.reader = protocol.MessageReader()
+
+
+    def feed(self, data):
+        try:
+            self.broadcast.publish_all(self.player, self.reader.feed(data))
+        except protocol.ProtocolException:
+            # the game goes on even if the spectators cannot follow it
+            self.reader = protocol.MessageReader()
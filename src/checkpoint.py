@@ -0,0 +1,236 @@
+import os
+import zlib
+import struct
+import board
+
+MAGIC = b"BSCP"
+FORMAT_VERSION = 1
+# sequence number of the snapshot, length and CRC-32 of the snapshot data following it
+RECORD = struct.Struct("<III")
+# magic, format version, board rows and cols, whose turn (TURN_*), number of ships, of the opponent's sunk ships
+# and of pending guesses, reply to the opponent's last shot (NO_REPLY if none), opponent's shots answered,
+# own shots with known result, game id; followed by
+# - the ship lengths of the fleet, one byte each
+# - the placed ships (SHIP) and the opponent's sunk ships (SUNK_SHIP)
+# - the pending guesses, as 2-byte cell indexes
+# - masks of the hits on the own board, and of the hits and misses on the opponent's one
+HEADER = struct.Struct("<4sBBBBHHBxHIIQ")
+# top-left cell index, length with the VERTICAL bit
+SHIP = struct.Struct("<HB")
+# cell index of the shot which sunk the ship, length of the ship
+SUNK_SHIP = struct.Struct("<HB")
+PENDING = struct.Struct("<H")
+VERTICAL = 0x80
+TURN_OPPONENT = 0
+TURN_MINE = 1
+TURN_UNKNOWN = 2
+# reply to a shot: missed, hit, or hit sinking the ship of length n coded as SUNK_BASE + n
+MISSED = 0
+HIT = 1
+SUNK_BASE = 1
+NO_REPLY = 0xFFFF
+# guesses waiting for their results, there is one at most as a player shoots only on its turn
+MAX_PENDING = 4
+
+
+class CheckpointException(Exception):
+    """Exception indicating that the game cannot be saved"""
+    pass
+
+
+class Snapshot():
+    """State of a game needed to resume it: own board, opponent's board as far as it is known,
+       guesses waiting for their results and whose turn it is.
+       Shots answered and shots with known result are counted, so that the players resuming the game
+       can tell which messages got lost, and the last reply is kept to be sent again.
+    """
+    def __init__(self, game_id, geometry, fleet, your_turn, ship_keys, hits, opponent_hits, opponent_misses,
+                 opponent_sunk=(), pending=(), shots_answered=0, shots_known=0, last_reply=()):
+        self.game_id = game_id
+        self.geometry = geometry
+        self.fleet = list(fleet)
+        self.your_turn = your_turn
+        # placement keys of the own ships and mask of the hit cells
+        self.ship_keys = list(ship_keys)
+        self.hits = hits
+        self.opponent_hits = opponent_hits
+        self.opponent_misses = opponent_misses
+        # (cell index of the shot, length) of the opponent's ships sunk so far
+        self.opponent_sunk = list(opponent_sunk)
+        # cell indexes of the guesses sent, but not answered yet
+        self.pending = list(pending)
+        self.shots_answered = shots_answered
+        self.shots_known = shots_known
+        # messages answering the opponent's last shot
+        self.last_reply = list(last_reply)
+
+
+def reply_code(messages):
+    if not messages:
+        return NO_REPLY
+    if messages[0] != "hit":
+        return MISSED
+    for message in messages[1:]:
+        if message.startswith("sunk "):
+            return SUNK_BASE + int(message[5:])
+    return HIT
+
+
+def reply_messages(code):
+    if code == NO_REPLY:
+        return []
+    if code == MISSED:
+        return ["missed"]
+    if code == HIT:
+        return ["hit"]
+    return ["hit", f"sunk {code - SUNK_BASE}"]
+
+
+def mask_size(geometry):
+    return (geometry.cells + 7) // 8
+
+
+def encode(snapshot):
+    """Encode the snapshot into bytes, 111 to 143 of them on the standard board
+    """
+    geometry = snapshot.geometry
+    if len(snapshot.pending) > MAX_PENDING:
+        raise CheckpointException("Too many guesses waiting for their results")
+    turn = TURN_UNKNOWN if snapshot.your_turn is None else (TURN_MINE if snapshot.your_turn else TURN_OPPONENT)
+    data = bytearray(HEADER.pack(MAGIC, FORMAT_VERSION, geometry.rows, geometry.cols, turn, len(snapshot.ship_keys),
+                                 len(snapshot.opponent_sunk), len(snapshot.pending), reply_code(snapshot.last_reply),
+                                 snapshot.shots_answered, snapshot.shots_known, snapshot.game_id))
+    data += bytes(snapshot.fleet)
+    for length, row, col, orientation in snapshot.ship_keys:
+        data += SHIP.pack(geometry.cell_index(row, col), length | (VERTICAL if orientation == "vertical" else 0))
+    for idx, length in snapshot.opponent_sunk:
+        data += SUNK_SHIP.pack(idx, length)
+    for idx in snapshot.pending:
+        data += PENDING.pack(idx)
+    size = mask_size(geometry)
+    for mask in (snapshot.hits, snapshot.opponent_hits, snapshot.opponent_misses):
+        data += mask.to_bytes(size, "little")
+    return bytes(data)
+
+
+def decode(data):
+    """Decode the snapshot encoded by encode(). Raises CheckpointException if the data is malformed.
+    """
+    if len(data) < HEADER.size:
+        raise CheckpointException("Truncated snapshot!")
+    (magic, version, rows, cols, turn, ships, sunk, pending, reply, shots_answered, shots_known,
+     game_id) = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version > FORMAT_VERSION:
+        raise CheckpointException("Not a snapshot or unsupported version!")
+    try:
+        geometry = board.geometry(rows, cols)
+    except board.BoardBaseException as e:
+        raise CheckpointException(str(e))
+    size = mask_size(geometry)
+    if len(data) < HEADER.size + ships * (1 + SHIP.size) + sunk * SUNK_SHIP.size + pending * PENDING.size + 3 * size:
+        raise CheckpointException("Truncated snapshot!")
+    pos = HEADER.size
+    fleet = list(data[pos:pos + ships])
+    pos += ships
+    ship_keys = []
+    for idx, length in SHIP.iter_unpack(data[pos:pos + ships * SHIP.size]):
+        orientation = "vertical" if length & VERTICAL else "horizontal"
+        ship_keys.append((length & ~VERTICAL, idx // cols + 1, idx % cols + 1, orientation))
+    pos += ships * SHIP.size
+    opponent_sunk = list(SUNK_SHIP.iter_unpack(data[pos:pos + sunk * SUNK_SHIP.size]))
+    pos += sunk * SUNK_SHIP.size
+    guesses = [idx for idx, in PENDING.iter_unpack(data[pos:pos + pending * PENDING.size])]
+    pos += pending * PENDING.size
+    masks = [int.from_bytes(data[pos + number * size:pos + (number + 1) * size], "little") for number in range(3)]
+    your_turn = None if turn == TURN_UNKNOWN else turn == TURN_MINE
+    return Snapshot(game_id, geometry, fleet, your_turn, ship_keys, *masks, opponent_sunk, guesses,
+                    shots_answered, shots_known, reply_messages(reply))
+
+
+class Checkpoint():
+    """Latest snapshot of a game, kept in a file of two fixed-size slots written in turns,
+       so that a write torn by a crash leaves the previous snapshot intact.
+       A snapshot is written with a single pwrite() and not synced: it survives the process being killed
+       or restarted, which is what resuming the game needs, at the cost of a few microseconds per move.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+        self.slot_size = None
+        self.sequence = 0
+
+
+    @staticmethod
+    def slot_size_for(geometry, fleet):
+        """Size of a slot holding any snapshot of the game on the given board with the given fleet
+        """
+        ships = len(fleet)
+        return (RECORD.size + HEADER.size + ships * (1 + SHIP.size + SUNK_SHIP.size) + MAX_PENDING * PENDING.size
+                + 3 * mask_size(geometry))
+
+
+    def open(self):
+        if self.fd is None:
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+    def load(self):
+        """Get the latest intact snapshot, None if there is none
+        """
+        if not os.path.exists(self.path):
+            return None
+        self.open()
+        data = os.pread(self.fd, os.fstat(self.fd).st_size, 0)
+        size = len(data) // 2
+        latest = None
+        for start in (0, size):
+            record = data[start:start + size]
+            if len(record) < RECORD.size:
+                continue
+            sequence, length, crc = RECORD.unpack_from(record, 0)
+            body = record[RECORD.size:RECORD.size + length]
+            if len(body) != length or zlib.crc32(body) != crc:
+                continue
+            try:
+                snapshot = decode(body)
+            except CheckpointException:
+                continue
+            if latest is None or sequence > latest[0]:
+                latest = (sequence, snapshot)
+        if latest is None:
+            return None
+        self.sequence = latest[0]
+        self.slot_size = size
+        return latest[1]
+
+
+    def save(self, snapshot):
+        """Write the snapshot over the older of the two kept ones
+        """
+        self.open()
+        size = self.slot_size_for(snapshot.geometry, snapshot.fleet)
+        if size != self.slot_size:
+            # first snapshot of the game, the file is laid out for its board and fleet
+            os.ftruncate(self.fd, 0)
+            os.ftruncate(self.fd, 2 * size)
+            self.slot_size = size
+            self.sequence = 0
+        body = encode(snapshot)
+        self.sequence += 1
+        record = RECORD.pack(self.sequence, len(body), zlib.crc32(body)) + body
+        os.pwrite(self.fd, record.ljust(size, b"\0"), (self.sequence % 2) * size)
+
+
+    def clear(self):
+        """Forget the saved game, e.g. once it is over
+        """
+        self.open()
+        os.ftruncate(self.fd, 0)
+        self.slot_size = None
+        self.sequence = 0
@@ -1,7 +1,17 @@
+import os
 import sys
+import time
 import socket
 import argparse
+import board
+import protocol
 from player import Player
+from replay import ReplayWriter
+from checkpoint import Checkpoint
+
+# attempts to connect again to the server of a saved game and seconds between them, e.g. while the server restarts
+RECONNECT_ATTEMPTS = 30
+RECONNECT_DELAY = 1.0
 
 
 def display_prompt(actor="Me"):
@@ -11,6 +21,8 @@ def display_prompt(actor="Me"):
 class Client(Player):
     def __init__(self, host='127.0.0.1', port=9009):
         super(Client, self).__init__(host=host, port=port)
+        self.family = None
+        self.sockaddr = None
         self.connect()
         self.your_turn = True
 
@@ -39,6 +51,7 @@ class Client(Player):
                 break
 
         family, type_, _, _, sockaddr = list(reversed(socket_info))[conn_id]
+        self.family, self.sockaddr = family, sockaddr
         self.conn_socket = socket.socket(family, type_)
         self.conn_socket.settimeout(2)
         try:
@@ -50,13 +63,55 @@ class Client(Player):
             print('Connected to remote host.')
 
 
+    def reconnect(self):
+        """Connect again to the server chosen before, waiting for it to come back if it restarts
+        """
+        self.conn_socket.close()
+        for attempt in range(RECONNECT_ATTEMPTS):
+            time.sleep(RECONNECT_DELAY)
+            self.conn_socket = socket.socket(self.family, socket.SOCK_STREAM)
+            self.conn_socket.settimeout(2)
+            try:
+                self.conn_socket.connect(self.sockaddr)
+            except OSError:
+                self.conn_socket.close()
+                continue
+            print('Reconnected to remote host.')
+            return True
+        return False
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='')
     parser.add_argument('-s', '--server', type=str, default="127.0.0.1", help='IP of the server')
     parser.add_argument('-p', '--port', type=int, default=9009, help='port used for the connection')
+    parser.add_argument('--record', type=str, default=None, help='append the game to the given replay file')
+    parser.add_argument('--rating', type=int, default=None, help='rating used to find an opponent of similar skill')
+    parser.add_argument('--screen', action='store_true', help='keep boards in place and update only the changed cells')
+    parser.add_argument('--render', type=str, default="plain", choices=board.RENDERERS.keys(), help='how boards are displayed')
+    parser.add_argument('--pace', type=str, default=None, help='seconds the bot waits before its replies, as MIN-MAX or 0')
+    parser.add_argument('--checkpoint', type=str, default=None, help='save the game to the given file after every move and resume it from there')
+    parser.add_argument('--size', type=str, default=None, help='size of the board as ROWSxCOLS, 10x10 by default')
+    parser.add_argument('--fleet', type=str, default=None, help='comma separated ship lengths, 4,3,3,2,2,2,1,1,1,1 by default')
     args = parser.parse_args()
+    board.Board.renderer = board.RENDERERS[args.render]
+    try:
+        geometry, fleet = board.board_config(args.size, args.fleet)
+        pace = protocol.parse_delay(args.pace) if args.pace else None
+    except (board.BoardBaseException, protocol.ProtocolException) as e:
+        parser.error(str(e))
+    if args.record and geometry is not board.DEFAULT_GEOMETRY:
+        parser.error("Replays can be recorded only on the standard board")
 
     instance = Client(host=args.server, port=args.port)
+    if args.record:
+        instance.replay = ReplayWriter(os.path.abspath(args.record))
+    instance.use_screen = args.screen
+    instance.rating = args.rating
+    instance.geometry, instance.fleet = geometry, fleet
+    instance.pace = pace
+    if args.checkpoint:
+        instance.checkpoint = Checkpoint(os.path.abspath(args.checkpoint))
     try:
         instance.run()
     except KeyboardInterrupt:
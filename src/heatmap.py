@@ -0,0 +1,119 @@
+import board
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAVE_NUMPY = np is not None
+
+
+# geometry -> length -> [(ship mask, [cell indexes])], filled as they are needed
+GEOMETRY_PLACEMENT_CELLS = dict()
+
+
+def placement_cells(length, geometry=board.DEFAULT_GEOMETRY):
+    """Mask and cells of every placement of the ship with the given length
+    """
+    by_length = GEOMETRY_PLACEMENT_CELLS.setdefault(geometry, dict())
+    if length not in by_length:
+        placements = geometry.placements(length) if geometry.fleet_fits([length]) else []
+        by_length[length] = [(ship, board.mask_cells(ship)) for ship, halo, key in placements]
+    return by_length[length]
+
+
+def remaining_fleet(fleet=board.FLEET):
+    """Count ships of every length in the fleet
+    """
+    return {length: fleet.count(length) for length in set(fleet)}
+
+
+def heatmap_python(blocked, remaining, geometry=board.DEFAULT_GEOMETRY):
+    """Heatmap of a single board as list of rows, blocked cells given as a board mask
+    """
+    heat = [0] * geometry.cells
+    for length, count in remaining.items():
+        if not count:
+            continue
+        for ship, cells in placement_cells(length, geometry):
+            if not ship & blocked:
+                for idx in cells:
+                    heat[idx] += count
+    return [heat[row * geometry.cols:(row + 1) * geometry.cols] for row in range(geometry.rows)]
+
+
+def masks_to_array(masks, geometry=board.DEFAULT_GEOMETRY):
+    """Convert board masks into boolean array of shape [games, rows, cols]
+    """
+    size = (geometry.cells + 7) // 8
+    data = np.frombuffer(b"".join(mask.to_bytes(size, "little") for mask in masks), dtype=np.uint8)
+    bits = np.unpackbits(data.reshape(len(masks), size), axis=1, bitorder="little")[:, :geometry.cells]
+    return bits.reshape(len(masks), geometry.rows, geometry.cols).astype(bool)
+
+
+def window_coverage(free, length, axis):
+    """Count windows of the given length lying entirely on free cells which cover each cell, along the axis
+    """
+    size = free.shape[axis]
+    if length > size:
+        return np.zeros(free.shape, dtype=np.int64)
+    pad_shape = list(free.shape)
+    pad_shape[axis] = 1
+    pad = np.zeros(pad_shape, dtype=np.int64)
+    sums = np.concatenate([pad, np.cumsum(free, axis=axis)], axis=axis)
+    starts = np.arange(size - length + 1)
+    valid = (np.take(sums, starts + length, axis=axis) - np.take(sums, starts, axis=axis)) == length
+    valid_sums = np.concatenate([pad, np.cumsum(valid, axis=axis)], axis=axis)
+    cells = np.arange(size)
+    # cell i is covered by windows starting in [i - length + 1, i]
+    high = np.minimum(cells, size - length) + 1
+    low = np.maximum(cells - length + 1, 0)
+    return np.take(valid_sums, high, axis=axis) - np.take(valid_sums, low, axis=axis)
+
+
+def heatmaps_numpy(blocked, remaining):
+    """Heatmaps of a batch of boards.
+       blocked is boolean array [games, rows, cols], remaining maps ship length to its count,
+       either a single number or an array with a count for every game.
+    """
+    free = (~blocked).astype(np.int64)
+    heat = np.zeros(free.shape, dtype=np.int64)
+    for length, count in remaining.items():
+        weights = np.asarray(count, dtype=np.int64).reshape(-1, 1, 1)
+        if not weights.any():
+            continue
+        coverage = window_coverage(free, length, axis=2)
+        if length > 1:
+            coverage = coverage + window_coverage(free, length, axis=1)
+        heat += coverage * weights
+    return heat
+
+
+def heatmap(blocked, remaining=None, geometry=board.DEFAULT_GEOMETRY):
+    """Heatmap of a single board: for every cell, how many legal placements of the remaining ships cover it.
+       Placement is legal if none of its cells is blocked (missed or known to be empty).
+       Blocked cells are given as a board mask. Uses NumPy if available, pure Python otherwise.
+    """
+    remaining = remaining_fleet() if remaining is None else remaining
+    if HAVE_NUMPY:
+        return heatmaps_numpy(masks_to_array([blocked], geometry), remaining)[0]
+    return heatmap_python(blocked, remaining, geometry)
+
+
+def heatmaps(blocked, remaining=None, geometry=board.DEFAULT_GEOMETRY):
+    """Heatmaps of many boards at once.
+       blocked is either a list of board masks or boolean array [games, rows, cols].
+       remaining maps ship length to its count, the same for every game,
+       or a list of such dictionaries, one for every game.
+    """
+    remaining = remaining_fleet() if remaining is None else remaining
+    if HAVE_NUMPY:
+        if not isinstance(blocked, np.ndarray):
+            blocked = masks_to_array(blocked, geometry)
+        if isinstance(remaining, list):
+            lengths = set(length for game in remaining for length in game)
+            remaining = {length: [game.get(length, 0) for game in remaining] for length in lengths}
+        return heatmaps_numpy(blocked, remaining)
+    if isinstance(remaining, list):
+        return [heatmap_python(mask, game, geometry) for mask, game in zip(blocked, remaining)]
+    return [heatmap_python(mask, remaining, geometry) for mask in blocked]
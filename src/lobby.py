@@ -0,0 +1,152 @@
+import time
+import heapq
+from collections import deque
+
+
+class Ticket():
+    """Place of a single client in the lobby queue"""
+    __slots__ = ("entry", "rating", "joined", "bucket", "active")
+
+    def __init__(self, entry, rating, joined, bucket):
+        self.entry = entry
+        self.rating = rating
+        self.joined = joined
+        self.bucket = bucket
+        self.active = True
+
+
+class Lobby():
+    """Queue of clients waiting for an opponent.
+       Without rating_window clients are paired first come, first served. With it, rated clients
+       are paired only with clients whose rating differs by at most rating_window: ratings are split
+       into buckets rating_window wide, and the longest waiting client of the own and both neighbouring
+       buckets is taken. Clients without rating are paired among themselves.
+       Clients are paired only within the same pool, e.g. the clients playing on the same board.
+       Clients leaving the queue are only marked, and skipped once they reach the front,
+       so joining, leaving, pairing and expiring take at most O(log n).
+    """
+    def __init__(self, rating_window=None, clock=time.monotonic):
+        self.rating_window = rating_window
+        self.clock = clock
+        # bucket -> deque of tickets in the order of joining
+        self.buckets = dict()
+        # heap of (joined, sequence number, ticket), to find the clients waiting the longest
+        self.deadlines = []
+        self.sequence = 0
+        self.tickets = dict()
+        # metrics
+        self.paired = 0
+        self.expired_count = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+
+    def __len__(self):
+        return len(self.tickets)
+
+
+    def bucket_of(self, rating, pool=None):
+        if rating is None or not self.rating_window:
+            return (pool, None)
+        return (pool, rating // self.rating_window)
+
+
+    def front(self, bucket):
+        """Longest waiting active ticket of the bucket
+        """
+        queue = self.buckets.get(bucket)
+        while queue:
+            if queue[0].active:
+                return queue[0]
+            queue.popleft()
+        return None
+
+
+    def join(self, entry, rating=None, pool=None):
+        """Add the client to the queue, unless there is an opponent waiting for it already.
+           Returns entry of the opponent, who is removed from the queue, or None if the client has to wait.
+        """
+        now = self.clock()
+        bucket = self.bucket_of(rating, pool)
+        if bucket[1] is None:
+            candidates = [self.front(bucket)]
+        else:
+            candidates = [self.front((pool, near)) for near in (bucket[1] - 1, bucket[1], bucket[1] + 1)]
+            candidates = [ticket for ticket in candidates
+                          if ticket is not None and abs(ticket.rating - rating) <= self.rating_window]
+        candidates = [ticket for ticket in candidates if ticket is not None]
+        if candidates:
+            opponent = min(candidates, key=lambda ticket: ticket.joined)
+            self.remove(opponent)
+            self.record_wait(now - opponent.joined)
+            self.record_wait(0.0)
+            self.paired += 1
+            return opponent.entry
+        ticket = Ticket(entry, rating, now, bucket)
+        self.tickets[entry] = ticket
+        self.buckets.setdefault(bucket, deque()).append(ticket)
+        heapq.heappush(self.deadlines, (now, self.sequence, ticket))
+        self.sequence += 1
+        return None
+
+
+    def remove(self, ticket):
+        ticket.active = False
+        del self.tickets[ticket.entry]
+
+
+    def leave(self, entry):
+        """Remove the client from the queue, if it is still there
+        """
+        ticket = self.tickets.get(entry)
+        if ticket is not None:
+            self.remove(ticket)
+
+
+    def oldest(self):
+        """Time of joining of the client waiting the longest, None if the queue is empty
+        """
+        while self.deadlines:
+            ticket = self.deadlines[0][2]
+            if ticket.active:
+                return ticket.joined
+            heapq.heappop(self.deadlines)
+        return None
+
+
+    def expire(self, max_wait):
+        """Remove and return entries of the clients waiting for max_wait or longer
+        """
+        now = self.clock()
+        expired = []
+        while self.oldest() is not None and now - self.deadlines[0][2].joined >= max_wait:
+            ticket = heapq.heappop(self.deadlines)[2]
+            self.remove(ticket)
+            self.record_wait(now - ticket.joined)
+            self.expired_count += 1
+            expired.append(ticket.entry)
+        return expired
+
+
+    def record_wait(self, wait):
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+
+    def stats(self):
+        """Queue depth and waiting times of the clients which left the queue, paired or given a bot
+        """
+        served = 2 * self.paired + self.expired_count
+        return {
+            "queued": len(self.tickets),
+            "paired": self.paired,
+            "expired": self.expired_count,
+            "avg_wait": self.total_wait / served if served else 0.0,
+            "max_wait": self.max_wait,
+        }
+
+
+    def report(self):
+        stats = self.stats()
+        return (f"Lobby: {stats['queued']} waiting, {stats['paired']} pairs matched, "
+                f"{stats['expired']} given a bot, wait avg {stats['avg_wait']:.2f}s max {stats['max_wait']:.2f}s")
@@ -0,0 +1,108 @@
+import os
+import sys
+import queue
+import atexit
+import functools
+import syslog
+import threading
+
+# Log levels are syslog priorities, lower is more severe
+ERROR = syslog.LOG_ERR
+WARNING = syslog.LOG_WARNING
+INFO = syslog.LOG_INFO
+DEBUG = syslog.LOG_DEBUG
+
+
+def syslog_sink(batch):
+    for level, message in batch:
+        syslog.syslog(level, message)
+
+
+def stream_sink(stream=None):
+    """Sink writing every batch to the stream at once, stdout by default"""
+    def write(batch):
+        target = sys.stdout if stream is None else stream
+        target.write("".join(message + "\n" for level, message in batch))
+        target.flush()
+    return write
+
+
+def at_level(log_method, level):
+    """Log method logging at the given level through log_method.
+       Only QueueLogger filters messages by their level, other methods, like print, get all of them.
+    """
+    if isinstance(log_method, QueueLogger):
+        return functools.partial(log_method, level=level)
+    return log_method
+
+
+class QueueLogger():
+    """Log method handing messages over to a background writer thread, so logging
+       never blocks the caller. Messages less severe than the level are discarded right away,
+       the rest is queued and written out by the sink in batches of up to batch_size messages.
+       If the queue is full, messages are dropped and counted rather than waited for.
+       The writer thread is started on first use, so the logger may be created before forking.
+    """
+    def __init__(self, sink=syslog_sink, level=INFO, batch_size=64, max_queue=10000):
+        self.sink = sink
+        self.level = level
+        self.batch_size = batch_size
+        self.max_queue = max_queue
+        self.dropped = 0
+        self.queue = None
+        self.thread = None
+        self.pid = None
+        atexit.register(self.close)
+
+
+    def __call__(self, message, level=INFO):
+        if level > self.level:
+            return
+        if self.pid != os.getpid():
+            self.start()
+        try:
+            self.queue.put_nowait((level, str(message)))
+        except queue.Full:
+            self.dropped += 1
+
+
+    def start(self):
+        # thread and queue of the parent do not survive fork, start anew
+        self.pid = os.getpid()
+        self.queue = queue.Queue(self.max_queue)
+        self.thread = threading.Thread(target=self.write_loop, name="log writer", daemon=True)
+        self.thread.start()
+
+
+    def write_loop(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            messages = [item for item in batch if item is not None]
+            try:
+                if messages:
+                    self.sink(messages)
+            except Exception:
+                self.dropped += len(messages)
+            for _ in batch:
+                self.queue.task_done()
+            if len(messages) < len(batch):
+                return
+
+
+    def flush(self):
+        """Wait until all the queued messages are written
+        """
+        if self.pid == os.getpid() and self.thread.is_alive():
+            self.queue.join()
+
+
+    def close(self):
+        if self.pid == os.getpid() and self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        self.pid = None
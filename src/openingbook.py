@@ -0,0 +1,257 @@
+import os
+import sys
+import mmap
+import struct
+import argparse
+from collections import deque
+import board
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAGIC = b"BSOB"
+FORMAT_VERSION = 1
+# magic, format version, board rows and cols, number of ships, number of nodes, number of edges;
+# followed by the ship lengths, one byte each
+HEADER = struct.Struct("<4sBBBBII")
+# cell to shoot at (NO_SHOT if none), number of children, index of the first edge, number of fleets behind the node
+NODE = struct.Struct("<HBxII")
+# result of the node's shot, child node
+EDGE = struct.Struct("<BxxxI")
+NO_SHOT = 0xFFFF
+ROOT = 0
+# results of the shots, a shot sinking a ship of length n is SUNK_BASE + n
+MISSED = 0
+HIT = 1
+SUNK_BASE = 1
+
+
+class BookException(Exception):
+    """Exception indicating that the opening book is malformed or cannot be built"""
+    pass
+
+
+def result_code(hit, sunk=None):
+    """Code of the shot result: missed, hit, or hit sinking the ship of length sunk
+    """
+    if not hit:
+        return MISSED
+    return SUNK_BASE + sunk if sunk else HIT
+
+
+def build_book(path, fleets=20000, depth=6, min_samples=100, seed=None, fleet=board.FLEET, geometry=board.DEFAULT_GEOMETRY):
+    """Derive the opening book from the given number of random fleets and write it to the file.
+       Every node holds the cell hit by the largest number of fleets consistent with the shots so far,
+       and one child for every result of that shot seen in at least min_samples of them, up to depth shots.
+       Requires NumPy. Returns number of nodes.
+    """
+    if np is None:
+        raise BookException("Building the opening book requires NumPy")
+    if len(fleet) > 127 or max(fleet) > 0xFF - SUNK_BASE:
+        raise BookException("Fleet too large for the opening book")
+    # per fleet: ship id occupying every cell (-1 if none), and length of every ship
+    ship_ids = np.full((fleets, geometry.cells), -1, dtype=np.int8)
+    for number, placements in enumerate(board.generate_fleets(fleets, seed, fleet, geometry)):
+        for sid, key in enumerate(placements):
+            ship_ids[number, board.mask_cells(geometry.placement(key)[0])] = sid
+    lengths = np.array(fleet, dtype=np.int64)
+
+    nodes, edges = [], []
+    # node id, fleets consistent with the shots so far, health of their ships, cells shot at, shots left
+    queue = deque([(ROOT, np.arange(fleets), np.tile(lengths, (fleets, 1)), np.zeros(geometry.cells, dtype=bool), depth)])
+    next_id = ROOT + 1
+    while queue:
+        node_id, samples, health, shot, left = queue.popleft()
+        cells = ship_ids[samples]
+        counts = (cells >= 0).sum(axis=0)
+        counts[shot] = -1
+        cell = int(np.argmax(counts))
+        children = []
+        if left > 1 and shot.sum() + 1 < geometry.cells:
+            sid = cells[:, cell].astype(np.int64)
+            hit = sid >= 0
+            health = health.copy()
+            rows = np.nonzero(hit)[0]
+            health[rows, sid[hit]] -= 1
+            codes = np.full(len(samples), MISSED, dtype=np.int64)
+            codes[rows] = np.where(health[rows, sid[hit]] == 0, SUNK_BASE + lengths[sid[hit]], HIT)
+            after = shot.copy()
+            after[cell] = True
+            for code in np.unique(codes):
+                chosen = codes == code
+                if chosen.sum() >= min_samples:
+                    children.append((int(code), next_id))
+                    queue.append((next_id, samples[chosen], health[chosen], after, left - 1))
+                    next_id += 1
+        nodes.append((cell, len(children), len(edges), len(samples)))
+        edges.extend(children)
+
+    with open(path, "wb") as book_file:
+        book_file.write(HEADER.pack(MAGIC, FORMAT_VERSION, geometry.rows, geometry.cols, len(fleet), len(nodes), len(edges)))
+        book_file.write(bytes(fleet))
+        for fields in nodes:
+            book_file.write(NODE.pack(*fields))
+        for fields in edges:
+            book_file.write(EDGE.pack(*fields))
+    return len(nodes)
+
+
+class OpeningBook():
+    """Read-only opening book: tree of the first shots, a node per sequence of results seen so far.
+       The file is memory-mapped on first use, so creating the book costs nothing until a bot plays.
+       The mapping is shared read-only: bot processes forked after it was opened use the same pages,
+       as do processes mapping the same file on their own.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.map = None
+        self.data = None
+
+
+    def open(self):
+        if self.data is not None:
+            return
+        self.file = open(self.path, "rb")
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise BookException("Empty opening book file!")
+        self.data = memoryview(self.map)
+        if len(self.data) < HEADER.size:
+            self.close()
+            raise BookException("Not an opening book!")
+        magic, version, self.rows, self.cols, ships, self.count, edges = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version > FORMAT_VERSION:
+            self.close()
+            raise BookException("Not an opening book or unsupported version!")
+        self.fleet = list(self.data[HEADER.size:HEADER.size + ships])
+        self.nodes_offset = HEADER.size + ships
+        self.edges_offset = self.nodes_offset + self.count * NODE.size
+        if len(self.data) < self.edges_offset + edges * EDGE.size:
+            self.close()
+            raise BookException("Truncated opening book!")
+
+
+    def __len__(self):
+        self.open()
+        return self.count
+
+
+    def __enter__(self):
+        self.open()
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+    def close(self):
+        if self.data is not None:
+            self.data.release()
+            self.data = None
+            self.map.close()
+            self.file.close()
+
+
+    def matches(self, geometry, fleet):
+        """Check that the book was built for the given board and fleet
+        """
+        self.open()
+        return (self.rows, self.cols) == (geometry.rows, geometry.cols) and self.fleet == list(fleet)
+
+
+    def node(self, node):
+        """(cell to shoot at, number of children, index of the first edge, number of fleets) of the node
+        """
+        if self.data is None:
+            self.open()
+        return NODE.unpack_from(self.data, self.nodes_offset + node * NODE.size)
+
+
+    def shot(self, node):
+        cell = self.node(node)[0]
+        return None if cell == NO_SHOT else cell
+
+
+    def child(self, node, result):
+        """Node following the shot of the given node with the given result, None if out of the book
+        """
+        cell, children, first, samples = self.node(node)
+        for number in range(first, first + children):
+            code, child = EDGE.unpack_from(self.data, self.edges_offset + number * EDGE.size)
+            if code == result:
+                return child
+        return None
+
+
+class BookCursor():
+    """Position of a single game in the opening book.
+       Result of the last shot is only noted, and followed once the next shot is needed,
+       as a hit may still turn out to have sunk a ship.
+    """
+    def __init__(self, book):
+        self.book = book
+        self.node = ROOT
+        self.result = None
+
+
+    def next_shot(self):
+        """Cell to shoot at next, None once the game left the book
+        """
+        if self.node is not None and self.result is not None:
+            self.node = self.book.child(self.node, self.result)
+            self.result = None
+        if self.node is None:
+            return None
+        cell = self.book.shot(self.node)
+        if cell is None:
+            self.node = None
+        return cell
+
+
+    def record(self, hit):
+        self.result = result_code(hit)
+
+
+    def sunk(self, length):
+        if self.result == HIT:
+            self.result = result_code(True, length)
+        else:
+            # sunk message of a shot the cursor has already moved past
+            self.node = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build and inspect opening books of the bot')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build', help='derive the opening book from simulated fleets')
+    build_parser.add_argument('book', type=str, help='opening book file to create')
+    build_parser.add_argument('-n', '--fleets', type=int, default=20000, help='number of simulated fleets')
+    build_parser.add_argument('-d', '--depth', type=int, default=6, help='number of shots covered by the book')
+    build_parser.add_argument('--min-samples', type=int, default=100, help='least number of fleets behind a node')
+    build_parser.add_argument('--seed', type=int, default=None, help='seed of the random generator, for reproducible books')
+    build_parser.add_argument('--size', type=str, default=None, help='size of the board as ROWSxCOLS, 10x10 by default')
+    build_parser.add_argument('--fleet', type=str, default=None, help='comma separated ship lengths, 4,3,3,2,2,2,1,1,1,1 by default')
+    stats_parser = subparsers.add_parser('stats', help='summarize the opening book')
+    stats_parser.add_argument('book', type=str, help='opening book file')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        geometry, fleet = board.board_config(args.size, args.fleet)
+        count = build_book(args.book, args.fleets, args.depth, args.min_samples, args.seed, fleet, geometry)
+        print(f"Built {count} nodes in {args.book} ({os.path.getsize(args.book)} bytes)")
+        sys.exit(0)
+
+    with OpeningBook(args.book) as book:
+        geometry = board.geometry(book.rows, book.cols)
+        line, node = [], ROOT
+        while node is not None and book.shot(node) is not None:
+            line.append(geometry.cell_names[book.shot(node)])
+            node = book.child(node, MISSED)
+        print(f"Board: {book.rows}x{book.cols}, fleet: {','.join(str(length) for length in book.fleet)}, nodes: {len(book)}")
+        print(f"Opening while missing: {' '.join(line)}")
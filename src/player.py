@@ -1,10 +1,13 @@
 import sys
 import socket
-import select
+import secrets
+import selectors
 import board
 import shutil
-
-RECV_BUFFER = 4096
+import protocol
+import logqueue
+import checkpoint
+from screen import Screen
 
 def query_yes_no(question, default="yes"):
     """Ask a yes/no question via input() and return their answer.
@@ -42,7 +45,47 @@ class Player():
         self.port = port
         self.conn_socket = None
         self.log = log_method
+        # moves and boards are logged in detail, they are left out of the daemon's log unless asked for
+        self.log_debug = logqueue.at_level(log_method, logqueue.DEBUG)
         self.your_turn = None
+        self.reader = protocol.MessageReader()
+        self.writer = protocol.MessageWriter()
+        self.protocol_version = None
+        # whether to offer the compact binary messages to the opponent
+        self.binary_protocol = False
+        # rating announced in the handshake, used by the matchmaking of the multi-game server
+        self.rating = None
+        # size of the boards and the ships of both players, both peers must agree on them
+        self.geometry = board.DEFAULT_GEOMETRY
+        self.fleet = board.FLEET
+        # (min seconds, max seconds) the opponent's bot should wait before its replies, None leaves it to the bot
+        self.pace = None
+        # replay.ReplayWriter recording the games, if any
+        self.replay = None
+        # whether boards are logged after every shot, rendering them is the costliest part of logging
+        self.log_boards = True
+        # whether to keep the boards in place on the terminal, updating only the changed cells
+        self.use_screen = False
+        self.screen = None
+        # checkpoint.Checkpoint the game is saved to after every move, so that it can be resumed after a disconnect
+        self.checkpoint = None
+        # id of the game agreed on in the handshake, None until then or if the game cannot be resumed
+        self.game_id = None
+        self.game_half = None
+        # whether the game was resumed and the opponent's handshake has not arrived yet,
+        # and the number of guesses pending when resumed, later ones are sent after the handshake
+        self.resuming = False
+        self.resumed_pending = 0
+        # opponent's shots answered and own shots with known result, compared when resuming the game
+        self.shots_answered = 0
+        self.shots_known = 0
+        # messages answering the opponent's last shot, sent again if the opponent did not get them
+        self.last_reply = []
+        # (cell index of the shot, length) of the opponent's ships sunk so far, and the cell of the last hit
+        self.opponent_sunk = []
+        self.last_hit = None
+        # counters of the last saved snapshot, the game is saved only after a move
+        self.saved_state = None
 
 
     def display_prompt(self, actor="Me"):
@@ -50,38 +93,59 @@ class Player():
 
     
     def send_message(self, message):
+        self.writer.write(message)
+
+
+    def flush_messages(self):
+        """Send all the buffered messages at once
+        """
+        self.save_game()
         if self.conn_socket:
-            self.conn_socket.send((f"{message}\n").encode("utf-8"))
+            try:
+                self.writer.flush(self.conn_socket)
+            except ConnectionError:
+                # disconnect is handled once the connection is read, lost messages are sent again on resume
+                pass
 
 
     def print_player_board(self):
-        self.log("                   PLAYER")
-        self.local_board.print(self.log)
+        if self.screen is not None:
+            return self.screen.update()
+        if not self.log_boards:
+            return
+        self.log_debug("                   PLAYER")
+        self.local_board.print(self.log_debug)
 
 
     def print_opponent_board(self):
-        self.log("                  OPPONENT")
-        self.opponent_board.print(self.log)
+        if self.screen is not None:
+            return self.screen.update()
+        if not self.log_boards:
+            return
+        self.log_debug("                  OPPONENT")
+        self.opponent_board.print(self.log_debug)
 
 
     def display_boards(self):
+        if self.screen is not None:
+            return self.screen.draw()
         size = shutil.get_terminal_size()
 
         player_lines = self.local_board.get_board_print_lines()
         opponent_lines = self.opponent_board.get_board_print_lines()
 
         if len(player_lines[0]) * 2 <= size.columns:
-            self.log(f"                   PLAYER                                          OPPONENT")
+            self.log_debug(f"                   PLAYER                                          OPPONENT")
             for line_player, line_oppo in zip(player_lines, opponent_lines):
-                self.log(f"{line_player}   {line_oppo}")
+                self.log_debug(f"{line_player}   {line_oppo}")
         else:
             self.print_player_board()
             self.print_opponent_board()
 
 
     def initialize_game(self, init_ships_method=None):
-        self.opponent_board = board.Board()
-        self.local_board = board.Board()
+        self.opponent_board = board.Board(self.geometry, self.fleet)
+        self.local_board = board.Board(self.geometry, self.fleet)
         self.last_guess_stack = list()
         if init_ships_method is None:
             print("Initialize your board. You can either do it manually or use a random generator.")
@@ -90,40 +154,224 @@ class Player():
         else:
             command = init_ships_method
         self.local_board.init_ships(command)
+        if self.replay is not None:
+            # opponent's fleet stays unknown to the player
+            self.replay.start_game([self.local_board.ship_keys, None], self.geometry)
+        if self.checkpoint is not None:
+            self.game_half = secrets.randbits(64)
+        size, fleet = self.board_options()
+        self.send_message(protocol.hello_message(binary=self.binary_protocol, rating=self.rating, size=size, fleet=fleet,
+                                                 pace=self.pace, game=self.game_half))
         self.send_message("ready")
-        self.log("""Commands:
+        self.flush_messages()
+        self.log_help()
+        self.log("Wait for your opponent to initiate their ships...")
+        self.display_prompt()
+
+    
+    def board_options(self):
+        """Board size and fleet to announce in the handshake, None for the standard ones
+        """
+        size = (self.geometry.rows, self.geometry.cols) if self.geometry is not board.DEFAULT_GEOMETRY else None
+        fleet = self.fleet if list(self.fleet) != board.FLEET else None
+        return size, fleet
+
+
+    def check_board_options(self, options):
+        """Check that the opponent plays on the same board with the same fleet
+        """
+        size, fleet = protocol.parse_board(options)
+        size = size or (board.BOARD_ROWS, board.BOARD_COLS)
+        fleet = fleet or board.FLEET
+        if size != (self.geometry.rows, self.geometry.cols) or fleet != list(self.fleet):
+            raise protocol.ProtocolException(f"Opponent plays on the {size[0]}x{size[1]} board with fleet {fleet}, "
+                                             f"not on the {self.geometry.rows}x{self.geometry.cols} one with fleet {list(self.fleet)}")
+
+
+    def log_help(self):
+        self.log(f"""Commands:
  player\t\tdisplay player's board
  opponent\tdisplay opponent's board
  boards\t\tdisplay both boards
- or guess coordinates by writing them in such format [A-J][1-10], e.g. A1
+ or guess coordinates by writing them in such format {self.geometry.range_text}, e.g. A1
  """)
-        self.log("Wait for your opponent to initiate their ships...")
-        self.display_prompt()
 
-    
+
     def get_data_from_opponent(self, endpoint: socket.socket):
-        data = endpoint.recv(RECV_BUFFER)
-        if not data:
+        """Returns list of messages received from the opponent, possibly empty if only a part of message arrived.
+           If the opponent disconnects from a saved game, the game is resumed once connected again.
+        """
+        try:
+            messages = self.reader.recv(endpoint)
+        except ConnectionError:
+            messages = None
+        if messages is None:
             self.log('\nDisconnected from server')
-            exit(1)
-        data_decoded = data.decode("utf-8")[0:-1]
-        return data_decoded
+            if self.game_id is None or not self.reconnect():
+                exit(1)
+            self.send_resume()
+            return []
+        return messages
+
+
+    def reconnect(self):
+        """Connect to the opponent again after a disconnect, replacing conn_socket. Returns whether connected.
+        """
+        return False
+
+
+    def follow_connection(self, selector, endpoint):
+        """Watch the current connection to the opponent instead of the given one, replaced by reconnect()
+        """
+        if endpoint is not self.conn_socket:
+            selector.unregister(endpoint)
+            selector.register(self.conn_socket, selectors.EVENT_READ)
+
+
+    def snapshot(self):
+        pending = [self.geometry.coordinate_cells[guess] for guess in self.last_guess_stack]
+        return checkpoint.Snapshot(self.game_id, self.geometry, self.fleet, self.your_turn, self.local_board.ship_keys,
+                                   self.local_board.hits, self.opponent_board.hits, self.opponent_board.misses,
+                                   self.opponent_sunk, pending, self.shots_answered, self.shots_known, self.last_reply)
+
+
+    def save_game(self):
+        """Save the game to the checkpoint, if a move was made since the last save
+        """
+        if self.checkpoint is None or self.game_id is None:
+            return
+        state = (self.shots_answered, self.shots_known, len(self.last_guess_stack), len(self.opponent_sunk))
+        if state != self.saved_state:
+            self.checkpoint.save(self.snapshot())
+            self.saved_state = state
+
+
+    def finish_game(self):
+        """Forget the saved game once it is over, it cannot be resumed anymore
+        """
+        if self.checkpoint is not None and self.game_id is not None:
+            self.checkpoint.clear()
+        self.game_id = None
+
+
+    def restore(self, snapshot):
+        """Set the game to the state of the snapshot
+        """
+        self.geometry, self.fleet = snapshot.geometry, snapshot.fleet
+        self.local_board = board.Board(self.geometry, self.fleet)
+        self.local_board.place_fleet(snapshot.ship_keys)
+        self.local_board.set_cells(snapshot.hits, board.HIT_SYMBOL)
+        self.opponent_board = board.Board(self.geometry, self.fleet)
+        self.opponent_board.set_cells(snapshot.opponent_hits, board.HIT_SYMBOL)
+        self.opponent_board.set_cells(snapshot.opponent_misses, board.MISSED_SYMBOL)
+        self.last_guess_stack = [self.geometry.cell_names[idx] for idx in snapshot.pending]
+        self.your_turn = snapshot.your_turn
+        self.game_id = snapshot.game_id
+        self.shots_answered, self.shots_known = snapshot.shots_answered, snapshot.shots_known
+        self.last_reply = snapshot.last_reply
+        self.opponent_sunk = snapshot.opponent_sunk
+        self.saved_state = (self.shots_answered, self.shots_known, len(self.last_guess_stack), len(self.opponent_sunk))
+
+
+    def resume_game(self, snapshot):
+        """Continue the game saved in the snapshot, e.g. after a restart
+        """
+        self.restore(snapshot)
+        if self.replay is not None:
+            # beginning of the game was buffered by the previous process
+            self.log("Resumed game is not recorded")
+            self.replay = None
+        self.log("Resuming the saved game...")
+        self.send_resume()
+        self.display_boards()
+        self.display_prompt()
+
+
+    def send_resume(self):
+        """Start the connection to the opponent with the handshake resuming the game
+        """
+        self.reader = protocol.MessageReader()
+        self.writer = protocol.MessageWriter()
+        self.resuming = True
+        self.resumed_pending = len(self.last_guess_stack)
+        size, fleet = self.board_options()
+        self.send_message(protocol.hello_message(binary=self.binary_protocol, rating=self.rating, size=size, fleet=fleet,
+                                                 pace=self.pace, resume=(self.game_id, self.shots_answered, self.shots_known)))
+        self.flush_messages()
+
+
+    def join_game(self, options):
+        """Agree on the game id with the opponent, or when resuming the game,
+           send again the messages which the opponent did not get before the disconnect
+        """
+        resume = protocol.parse_resume(options)
+        if not self.resuming:
+            if resume is not None:
+                raise protocol.ProtocolException("Opponent resumes a game which is not saved here")
+            half = protocol.parse_game(options)
+            if self.game_half is not None and half is not None:
+                self.game_id = self.game_half ^ half
+            return
+        self.resuming = False
+        if resume is None or resume[0] != self.game_id:
+            raise protocol.ProtocolException("Opponent did not resume the saved game")
+        game_id, answered, known = resume
+        if known + 1 < self.shots_answered or answered < self.shots_known:
+            raise protocol.ProtocolException("Saved games of the players are too far apart to resume")
+        if known < self.shots_answered:
+            for message in self.last_reply:
+                self.send_message(message)
+        for guess in self.last_guess_stack[answered - self.shots_known:self.resumed_pending]:
+            self.send_message(guess)
+        if self.your_turn:
+            self.log("--->Your turn!")
 
 
     def handle_received_msg(self, msg):
         msg = msg.lower()
         if msg == "hit":
+            self.record_move(0, self.last_guess_stack[-1], True)
+            self.shots_known += 1
+            self.last_hit = self.geometry.coordinate_cells[self.last_guess_stack[-1]]
             self.opponent_board.insert_by_coor(self.last_guess_stack.pop(), board.HIT_SYMBOL)
             self.print_opponent_board()
             self.your_turn = True
-            self.log("[Me] My turn again!")
+            self.log_debug("[Me] My turn again!")
 
         elif msg == "missed":
+            self.record_move(0, self.last_guess_stack[-1], False)
+            self.shots_known += 1
             self.opponent_board.insert_by_coor(self.last_guess_stack.pop(), board.MISSED_SYMBOL)
 
         elif msg == "gameover":
             self.log("You WON!")
-            exit(0)
+            if self.replay is not None:
+                self.replay.end_game(0)
+            self.finish_game()
+            self.end_game()
+
+        elif msg.startswith(protocol.HELLO):
+            hello = protocol.parse_hello(msg)
+            if hello is None:
+                raise protocol.ProtocolException(f"Malformed handshake: {msg}")
+            version, options = hello
+            self.check_board_options(options)
+            self.protocol_version = min(version, protocol.PROTOCOL_VERSION)
+            self.writer.binary = self.binary_protocol and protocol.BINARY in options
+            self.join_game(options)
+
+        elif msg.startswith(protocol.SUNK):
+            length = protocol.parse_sunk(msg)
+            self.log_debug(f"[Me] Opponent's {length}-square ship sunk!")
+            if self.last_hit is not None:
+                self.opponent_sunk.append((self.last_hit, length))
+                self.last_hit = None
+            if self.replay is not None:
+                self.replay.sunk(length)
+
+        elif msg == "wait":
+            self.your_turn = False
+            self.log("Opponent starts the game, wait for their guess...")
 
         elif msg == "ready":
             if self.your_turn:
@@ -132,22 +380,49 @@ class Player():
                 self.log("Wait for opponent to start guessing...")
 
         else:
+            self.shots_answered += 1
             if self.local_board.is_hit(msg):
-                self.log("[Me] Hit!")
-                self.send_message("hit")
+                self.log_debug("[Me] Hit!")
+                self.last_reply = ["hit"]
+                self.record_move(1, msg, True)
+                sunk = self.local_board.last_sunk
+                if sunk is not None:
+                    if self.replay is not None:
+                        self.replay.sunk(sunk[0])
+                    if (self.protocol_version or 0) >= protocol.SUNK_VERSION:
+                        self.last_reply.append(protocol.sunk_message(sunk[0]))
+                for message in self.last_reply:
+                    self.send_message(message)
                 self.print_player_board()
                 if self.local_board.count_symbols(board.SHIP_SYMBOL) == 0:
                     self.log("Game over, You LOST!")
                     self.send_message("gameover")
+                    if self.replay is not None:
+                        self.replay.end_game(1)
+                    self.finish_game()
 
             else:
-                self.log("[Me] Missed!")
+                self.record_move(1, msg, False)
+                self.log_debug("[Me] Missed!")
+                self.last_reply = ["missed"]
                 self.send_message("missed")
-                self.log("--->Your turn!")
+                self.log_debug("--->Your turn!")
                 self.your_turn = True
         self.display_prompt()
 
 
+    def record_move(self, shooter, coordinates, hit):
+        """Record the shot in the replay, shooter being 0 for this player and 1 for the opponent
+        """
+        if self.replay is not None:
+            row, col = self.local_board.get_single_coor(coordinates)
+            self.replay.move(shooter, self.geometry.cell_index(row, col), hit)
+
+
+    def end_game(self):
+        exit(0)
+
+
     def handle_user_action(self, action):
         action = str(action).strip()
         if action == "player":
@@ -166,8 +441,11 @@ class Player():
                 self.log(str(e))
             else:
                 if self.your_turn:
-                    self.send_message(action)
-                    self.last_guess_stack.append(action)
+                    # guess is kept by its canonical name, e.g. "a01" as "A1"
+                    row, col = self.opponent_board.get_single_coor(action)
+                    guess = self.geometry.cell_names[self.geometry.cell_index(row, col)]
+                    self.send_message(guess)
+                    self.last_guess_stack.append(guess)
                     self.your_turn = False
                 else:
                     self.log("Wait for your turn!")
@@ -175,21 +453,40 @@ class Player():
         self.display_prompt()
 
 
+    def start_game(self, init_ships_method=None):
+        """Resume the game saved to the checkpoint, or start a new one if there is none
+        """
+        snapshot = self.checkpoint.load() if self.checkpoint is not None else None
+        if snapshot is not None:
+            self.resume_game(snapshot)
+        else:
+            self.initialize_game(init_ships_method)
+
+
     def run(self, init_ships_method=None):
-        self.initialize_game(init_ships_method)
+        self.start_game(init_ships_method)
+        if self.use_screen:
+            self.screen = Screen([("PLAYER", self.local_board), ("OPPONENT", self.opponent_board)])
+            self.screen.draw()
+            self.log_help()
+            self.display_prompt()
+        # both sources are registered once, the loop itself builds no lists
+        selector = selectors.DefaultSelector()
+        selector.register(self.conn_socket, selectors.EVENT_READ)
+        selector.register(sys.stdin, selectors.EVENT_READ)
         while True:
-            socket_list = [sys.stdin, self.conn_socket]
-            # get the list sockets which are readable
-            ready_to_read, ready_to_write, in_error = select.select(socket_list, [], [])
-
-            for sock in ready_to_read:
-                if sock == self.conn_socket:
-                    msgs = self.get_data_from_opponent(sock)
-                    for msg in msgs.strip().split("\n"):
-                        self.log(f"\r[Opponent] {msg}")
+            for key, events in selector.select():
+                if key.fileobj is not sys.stdin:
+                    msgs = self.get_data_from_opponent(key.fileobj)
+                    self.follow_connection(selector, key.fileobj)
+                    for msg in msgs:
+                        self.log_debug(f"\r[Opponent] {msg}")
                         self.handle_received_msg(msg)
 
                 else:  
                     user_action = sys.stdin.readline()
                     self.handle_user_action(user_action)
+            if self.screen is not None:
+                self.screen.update()
+            self.flush_messages()
     
\ No newline at end of file
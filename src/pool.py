@@ -0,0 +1,276 @@
+import os
+import sys
+import time
+import errno
+import signal
+import socket
+import syslog
+import asyncio
+import argparse
+import selectors
+import protocol
+import logqueue
+from server import Server, AsyncServer, BotPlayer, DEFAULT_STRATEGY, DEFAULT_BOT_DELAY
+from strategy import STRATEGIES
+from openingbook import OpeningBook
+
+DAEMON_UID = 1000
+# seconds between checks of the load of a worker, which is reported to the supervisor when it changes
+LOAD_CHECK_INTERVAL = 0.5
+# a worker dying sooner than this after its start is respawned only once this much time has passed
+RESPAWN_DELAY = 1.0
+
+
+class Worker():
+    """Worker process as seen by the supervisor"""
+    __slots__ = ("slot", "pid", "pipe", "started", "running", "played", "buffer")
+
+    def __init__(self, slot, pid, pipe, started):
+        self.slot = slot
+        self.pid = pid
+        self.pipe = pipe
+        self.started = started
+        # last load reported by the worker
+        self.running = 0
+        self.played = 0
+        self.buffer = b""
+
+
+class BotPool():
+    """Supervisor of pre-forked worker processes, each of them hosting bot games with AsyncServer.
+       Workers either inherit the listening socket of the supervisor, or with reuse_port bind
+       their own sockets with SO_REUSEPORT, and the kernel spreads the connections across them.
+       Every worker reports its load through a pipe, the supervisor logs it every report_interval
+       seconds and respawns the workers which died.
+    """
+    def __init__(self, port=9009, workers=None, strategy=DEFAULT_STRATEGY, bot_delay=DEFAULT_BOT_DELAY,
+                 reuse_port=False, report_interval=60.0, log_method=print):
+        self.port = port
+        self.size = workers or os.cpu_count() or 1
+        self.strategy = strategy
+        self.bot_delay = bot_delay
+        self.reuse_port = reuse_port
+        self.report_interval = report_interval
+        self.log = log_method
+        self.sock = None
+        # pid -> Worker
+        self.workers = dict()
+        # slot -> time before which the slot is not respawned
+        self.respawn_at = dict()
+        self.respawned = 0
+        self.running = False
+        self.selector = None
+
+
+    def listen(self):
+        """Bind the port. With reuse_port the socket only holds the port and never accepts,
+           as connections are spread over the listening sockets only.
+        """
+        self.sock = self.bind()
+        if not self.reuse_port:
+            self.sock.listen(1024)
+
+
+    def bind(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.reuse_port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind(('', self.port))
+        return sock
+
+
+    def spawn(self, slot):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            status = 0
+            try:
+                self.run_worker(write_fd)
+            except BaseException as e:
+                logqueue.at_level(self.log, logqueue.ERROR)(f"Worker {os.getpid()} failed: {str(e)}")
+                status = 1
+            finally:
+                if isinstance(self.log, logqueue.QueueLogger):
+                    self.log.close()
+                os._exit(status)
+        os.close(write_fd)
+        os.set_blocking(read_fd, False)
+        worker = Worker(slot, pid, read_fd, time.monotonic())
+        self.workers[pid] = worker
+        self.selector.register(read_fd, selectors.EVENT_READ, worker)
+        return worker
+
+
+    def run_worker(self, report_fd):
+        """Body of the worker process: serve bot games until killed
+        """
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        self.selector.close()
+        for worker in self.workers.values():
+            if worker.pipe is not None:
+                os.close(worker.pipe)
+        self.workers.clear()
+        sock = self.bind() if self.reuse_port else self.sock
+        if self.reuse_port:
+            sock.listen(1024)
+            self.sock.close()
+        sock.setblocking(False)
+        server = AsyncServer(port=self.port, pair_timeout=0, bot_delay=self.bot_delay, log_method=self.log,
+                             strategy=self.strategy, stats_interval=0, sock=sock)
+        asyncio.run(self.serve_worker(server, report_fd))
+
+
+    async def serve_worker(self, server, report_fd):
+        serving = asyncio.create_task(server.serve())
+        reported = None
+        try:
+            while not serving.done():
+                load = (server.games_running, server.games_played)
+                if load != reported:
+                    # fails once the supervisor is gone, which ends the worker too
+                    os.write(report_fd, f"{load[0]} {load[1]}\n".encode(protocol.ENCODING))
+                    reported = load
+                await asyncio.wait([serving], timeout=LOAD_CHECK_INTERVAL)
+            serving.result()
+        finally:
+            serving.cancel()
+
+
+    def read_load(self, worker):
+        try:
+            data = os.read(worker.pipe, protocol.RECV_BUFFER)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return
+            data = b""
+        if not data:
+            # worker is gone, it is reaped and respawned by reap()
+            self.selector.unregister(worker.pipe)
+            os.close(worker.pipe)
+            worker.pipe = None
+            return
+        *lines, worker.buffer = (worker.buffer + data).split(b"\n")
+        if lines:
+            running, played = lines[-1].split()
+            worker.running, worker.played = int(running), int(played)
+
+
+    def reap(self):
+        """Collect the workers which exited and schedule their respawn
+        """
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            worker = self.workers.pop(pid, None)
+            if worker is None:
+                continue
+            if worker.pipe is not None:
+                self.selector.unregister(worker.pipe)
+                os.close(worker.pipe)
+            logqueue.at_level(self.log, logqueue.WARNING)(f"Worker {pid} exited with status {status}, {worker.played} games played")
+            too_soon = time.monotonic() - worker.started < RESPAWN_DELAY
+            self.respawn_at[worker.slot] = time.monotonic() + (RESPAWN_DELAY if too_soon else 0.0)
+
+
+    def respawn(self):
+        now = time.monotonic()
+        for slot, when in list(self.respawn_at.items()):
+            if when <= now and self.running:
+                del self.respawn_at[slot]
+                self.spawn(slot)
+                self.respawned += 1
+
+
+    def load(self):
+        """Per worker (pid, games running, games played), in the order of the slots
+        """
+        return [(worker.pid, worker.running, worker.played) for worker in sorted(self.workers.values(), key=lambda worker: worker.slot)]
+
+
+    def report(self):
+        workers = ", ".join(f"{pid}: {running} running/{played} played" for pid, running, played in self.load())
+        return f"Bot pool: {len(self.workers)} workers, {self.respawned} respawned; {workers}"
+
+
+    def stop(self, signum=None, frame=None):
+        self.running = False
+
+
+    def run(self):
+        if self.sock is None:
+            self.listen()
+        self.selector = selectors.DefaultSelector()
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for slot in range(self.size):
+            self.spawn(slot)
+        self.log(f"Bot pool of {self.size} workers started on port {self.port}")
+        next_report = time.monotonic() + self.report_interval
+        try:
+            while self.running:
+                for key, events in self.selector.select(1.0):
+                    self.read_load(key.data)
+                self.reap()
+                self.respawn()
+                if self.report_interval and time.monotonic() >= next_report:
+                    self.log(self.report())
+                    next_report += self.report_interval
+        finally:
+            self.shutdown()
+
+
+    def shutdown(self):
+        for pid in self.workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in list(self.workers):
+            os.waitpid(pid, 0)
+            worker = self.workers.pop(pid)
+            if worker.pipe is not None:
+                self.selector.unregister(worker.pipe)
+                os.close(worker.pipe)
+        self.selector.close()
+        self.sock.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Host bot games in a pool of pre-forked daemon processes')
+    parser.add_argument('-p', '--port', type=int, default=9009, help='port used for the connections')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='number of worker processes, one per CPU by default')
+    parser.add_argument('--reuse-port', action='store_true', help='let every worker bind the port with SO_REUSEPORT instead of sharing one socket')
+    parser.add_argument('--report-interval', type=float, default=60.0, help='seconds between logged load reports, 0 to disable')
+    parser.add_argument('--strategy', type=str, default=DEFAULT_STRATEGY, choices=STRATEGIES.keys(), help='guessing strategy of the bots')
+    parser.add_argument('--bot-delay', type=str, default="1-3", help='seconds the bots wait before their replies, as MIN-MAX or 0')
+    parser.add_argument('--book', type=str, default=None, help='opening book of the bots, built by openingbook.py')
+    parser.add_argument('--log-level', type=str, default="info", choices=("error", "warning", "info", "debug"),
+                        help='least severe messages logged to syslog')
+    parser.add_argument('-f', '--foreground', action='store_true', help='do not daemonize, log to the terminal')
+    args = parser.parse_args()
+    try:
+        bot_delay = protocol.parse_delay(args.bot_delay)
+    except protocol.ProtocolException as e:
+        parser.error(str(e))
+    if args.book:
+        BotPlayer.opening_book = OpeningBook(os.path.abspath(args.book))
+
+    log_method = print if args.foreground else logqueue.QueueLogger(level=getattr(logqueue, args.log_level.upper()))
+    pool = BotPool(port=args.port, workers=args.workers, strategy=args.strategy, bot_delay=bot_delay,
+                   reuse_port=args.reuse_port, report_interval=args.report_interval, log_method=log_method)
+    # port is bound before daemonizing, so that errors reach the terminal
+    pool.listen()
+    print(f"Battleship bot pool started on port {args.port}")
+    if not args.foreground:
+        Server.daemonize(DAEMON_UID)
+        syslog.openlog("Battleship server bot", syslog.LOG_PID, syslog.LOG_LOCAL7)
+    pool.run()
+    sys.exit(0)
@@ -0,0 +1,277 @@
+PROTOCOL_VERSION = 3
+# first version reporting sunk ships
+SUNK_VERSION = 3
+ENCODING = "utf-8"
+SEPARATOR = b"\n"
+RECV_BUFFER = 4096
+MAX_MESSAGE_LENGTH = 1024
+HELLO = "hello"
+BINARY = "binary"
+RATING = "rating"
+BOARD = "board"
+FLEET = "fleet"
+PACE = "pace"
+GAME = "game"
+RESUME = "resume"
+SUNK = "sunk"
+
+# Binary mode, negotiated in the handshake: every message is a single byte with the highest bit set,
+# so it cannot be confused with the ASCII text messages. A shot is 0x80 + cell index (A1 is 0, J10 is 99),
+# a result is one of the status codes below.
+SHOT_BASE = 0x80
+CELL_NAMES = [f"{y}{x}" for y in "ABCDEFGHIJ" for x in range(1, 11)]
+STATUS_CODES = {"hit": 0xF0, "missed": 0xF1, "gameover": 0xF2, "ready": 0xF3, "wait": 0xF4}
+for _length in range(1, 11):
+    STATUS_CODES[f"{SUNK} {_length}"] = 0xF4 + _length
+BINARY_CODES = dict(STATUS_CODES)
+for _idx, _name in enumerate(CELL_NAMES):
+    BINARY_CODES[_name] = BINARY_CODES[_name.lower()] = SHOT_BASE + _idx
+del _idx, _name, _length
+BINARY_MESSAGES = {code: message for message, code in BINARY_CODES.items() if not message.islower() or message in STATUS_CODES}
+
+
+class ProtocolException(Exception):
+    """Exception indicating that the peer does not follow the protocol"""
+    pass
+
+
+def encode_messages(messages):
+    """Encode messages into a single chunk of bytes, each message terminated by the separator
+    """
+    return "".join(f"{message}\n" for message in messages).encode(ENCODING)
+
+
+def hello_message(version=PROTOCOL_VERSION, binary=False, rating=None, size=None, fleet=None, pace=None, game=None, resume=None):
+    """Handshake message, which both peers send before anything else.
+       Peer able to receive binary messages advertises it after the version,
+       rating used by the matchmaking follows as rating=<number>.
+       Games on other than the standard board announce its size as board=<rows>x<cols>
+       and the ship lengths as fleet=<length>,<length>,...
+       Player may ask the bot to delay its replies by pace=<min seconds>-<max seconds>, or pace=0 for no delay.
+       Player saving the game to resume it later announces its half of the game id as game=<hex number>,
+       the game id being both halves XORed. Player resuming the game sends resume=<game id>/<answered>/<known>
+       instead: the number of the opponent's shots it answered and of its own shots it knows the result of.
+    """
+    parts = [HELLO, str(version)]
+    if binary:
+        parts.append(BINARY)
+    if rating is not None:
+        parts.append(f"{RATING}={rating}")
+    if size is not None:
+        parts.append(f"{BOARD}={size[0]}x{size[1]}")
+    if fleet is not None:
+        parts.append(f"{FLEET}={','.join(str(length) for length in fleet)}")
+    if pace is not None:
+        parts.append(f"{PACE}={pace[0]:g}-{pace[1]:g}")
+    if game is not None:
+        parts.append(f"{GAME}={game:x}")
+    if resume is not None:
+        parts.append(f"{RESUME}={resume[0]:x}/{resume[1]}/{resume[2]}")
+    return " ".join(parts)
+
+
+def sunk_message(length):
+    """Message following the hit which sunk a ship of the given length
+    """
+    return f"{SUNK} {length}"
+
+
+def parse_sunk(message):
+    """Get length of the sunk ship from the message. Returns None if it is not a sunk message.
+    """
+    parts = message.lower().split(" ")
+    if len(parts) != 2 or parts[0] != SUNK or not parts[1].isdigit():
+        return None
+    return int(parts[1])
+
+
+def parse_hello(message):
+    """Get protocol version and list of advertised options from the handshake message. 
+       Returns None if it is not a handshake.
+    """
+    parts = message.lower().split(" ")
+    if len(parts) < 2 or parts[0] != HELLO or not parts[1].isdigit():
+        return None
+    return int(parts[1]), parts[2:]
+
+
+def parse_rating(options):
+    """Get rating from the options of the handshake, None if not given
+    """
+    for option in options:
+        name, _, value = option.partition("=")
+        if name == RATING and value.isdigit():
+            return int(value)
+    return None
+
+
+def parse_board(options):
+    """Get (rows, cols) of the board and list of ship lengths from the options of the handshake,
+       None for the ones not given
+    """
+    size, fleet = None, None
+    for option in options:
+        name, _, value = option.partition("=")
+        if name == BOARD:
+            rows, _, cols = value.partition("x")
+            if not (rows.isdigit() and cols.isdigit()):
+                raise ProtocolException(f"Malformed board size: {value}")
+            size = (int(rows), int(cols))
+        elif name == FLEET:
+            lengths = value.split(",")
+            if not all(length.isdigit() for length in lengths):
+                raise ProtocolException(f"Malformed fleet: {value}")
+            fleet = [int(length) for length in lengths]
+    return size, fleet
+
+
+def parse_delay(value):
+    """Get (min seconds, max seconds) from the delay given as "<min>-<max>" or a single number
+    """
+    low, _, high = value.partition("-")
+    try:
+        low, high = float(low), float(high or low)
+    except ValueError:
+        raise ProtocolException(f"Malformed delay: {value}")
+    if not 0 <= low <= high:
+        raise ProtocolException(f"Malformed delay: {value}")
+    return low, high
+
+
+def parse_pace(options):
+    """Get delay of the bot's replies asked for in the options of the handshake, None if not given
+    """
+    for option in options:
+        name, _, value = option.partition("=")
+        if name == PACE:
+            return parse_delay(value)
+    return None
+
+
+def parse_game(options):
+    """Get the opponent's half of the game id from the options of the handshake, None if not given
+    """
+    for option in options:
+        name, _, value = option.partition("=")
+        if name == GAME:
+            try:
+                return int(value, 16)
+            except ValueError:
+                raise ProtocolException(f"Malformed game id: {value}")
+    return None
+
+
+def parse_resume(options):
+    """Get (game id, shots answered, shots known) of the resumed game from the options of the handshake, 
+       None if the game is not resumed
+    """
+    for option in options:
+        name, _, value = option.partition("=")
+        if name == RESUME:
+            parts = value.split("/")
+            if len(parts) != 3 or not (parts[1].isdigit() and parts[2].isdigit()):
+                raise ProtocolException(f"Malformed resume: {value}")
+            try:
+                return int(parts[0], 16), int(parts[1]), int(parts[2])
+            except ValueError:
+                raise ProtocolException(f"Malformed resume: {value}")
+    return None
+
+
+class MessageReader():
+    """Splits the incoming stream of bytes into messages.
+       Incomplete message is kept in the buffer until the rest of it arrives.
+    """
+    def __init__(self, max_length=MAX_MESSAGE_LENGTH):
+        self.buffer = bytearray()
+        self.max_length = max_length
+
+
+    def feed(self, data):
+        """Add received bytes to the buffer and return list of all the messages completed by them
+        """
+        if not data.isascii():
+            return self.feed_mixed(data)
+        self.buffer += data
+        if SEPARATOR not in data:
+            if len(self.buffer) > self.max_length:
+                raise ProtocolException("Message too long!")
+            return []
+        *frames, rest = self.buffer.split(SEPARATOR)
+        self.buffer = bytearray(rest)
+        messages = []
+        for frame in frames:
+            message = frame.decode(ENCODING).strip()
+            if message:
+                messages.append(message)
+        return messages
+
+
+    def feed_mixed(self, data):
+        """Slow path of feed() for data containing binary messages. 
+           Byte with the highest bit set is a binary message only if it starts a new message.
+        """
+        buffer = self.buffer + data
+        messages = []
+        start = 0
+        for idx, byte in enumerate(buffer):
+            if byte >= SHOT_BASE and idx == start:
+                message = BINARY_MESSAGES.get(byte)
+                if message is None:
+                    raise ProtocolException(f"Unknown binary message: {byte:#x}")
+                messages.append(message)
+                start = idx + 1
+            elif byte == SEPARATOR[0]:
+                message = buffer[start:idx].decode(ENCODING).strip()
+                if message:
+                    messages.append(message)
+                start = idx + 1
+        self.buffer = buffer[start:]
+        if len(self.buffer) > self.max_length:
+            raise ProtocolException("Message too long!")
+        return messages
+
+
+    def recv(self, endpoint, size=RECV_BUFFER):
+        """Read from the socket once. Returns list of completed messages or None if the peer disconnected.
+        """
+        data = endpoint.recv(size)
+        if not data:
+            return None
+        return self.feed(data)
+
+
+class MessageWriter():
+    """Collects outgoing messages, so that all of them are sent with a single system call.
+       In binary mode shots and results are encoded as single bytes, other messages as text.
+    """
+    def __init__(self):
+        self.pending = []
+        self.binary = False
+
+
+    def write(self, message):
+        self.pending.append(message)
+
+
+    def take(self):
+        """Get all the pending messages encoded into a single chunk of bytes and clear them
+        """
+        if self.binary:
+            data = bytearray()
+            for message in self.pending:
+                code = BINARY_CODES.get(message)
+                if code is None:
+                    data += f"{message}\n".encode(ENCODING)
+                else:
+                    data.append(code)
+            data = bytes(data)
+        else:
+            data = encode_messages(self.pending)
+        self.pending.clear()
+        return data
+
+
+    def flush(self, endpoint):
+        if self.pending:
+            endpoint.sendall(self.take())
@@ -0,0 +1,242 @@
+import os
+import sys
+import time
+import argparse
+import board
+
+MAGIC = b"BSRP"
+FORMAT_VERSION = 1
+# Entries of the replay stream. A move takes 2 bytes: (shooter << 7 | cell index) and result,
+# so its first byte never reaches the tags, which are followed by their own data.
+GAME_START = 0xF0   # followed by two fleets: number of ships, then 2 bytes per ship
+GAME_END = 0xF1     # followed by the index of the winner, NO_WINNER if unknown
+SUNK = 0xF2         # followed by the length of the ship sunk by the preceding move
+MISSED = 0
+HIT = 1
+NO_WINNER = 0xFF
+UNKNOWN_FLEET = 0xFF
+VERTICAL = 0x80
+
+
+class ReplayException(Exception):
+    """Exception indicating that the replay data is malformed"""
+    pass
+
+
+def encode_fleet(fleet):
+    """Encode list of placement keys, 2 bytes per ship: top-left cell index and length with orientation bit.
+       Unknown fleet (None) is encoded as a single byte.
+    """
+    if fleet is None:
+        return bytes([UNKNOWN_FLEET])
+    data = bytearray([len(fleet)])
+    for length, row, col, orientation in fleet:
+        data.append(board.cell_index(row, col))
+        data.append(length | (VERTICAL if orientation == "vertical" else 0))
+    return bytes(data)
+
+
+def decode_fleet(data, pos):
+    count = data[pos]
+    pos += 1
+    if count == UNKNOWN_FLEET:
+        return None, pos
+    fleet = []
+    for _ in range(count):
+        idx, length = data[pos], data[pos + 1]
+        pos += 2
+        orientation = "vertical" if length & VERTICAL else "horizontal"
+        fleet.append((length & ~VERTICAL, idx // board.BOARD_COLS + 1, idx % board.BOARD_COLS + 1, orientation))
+    return fleet, pos
+
+
+class GameRecord():
+    """Single recorded game. Fleets of both players (None if unknown),
+       moves as (shooter, cell index, hit, length of the sunk ship or 0) tuples and index of the winner.
+    """
+    def __init__(self, fleets=None, moves=None, winner=None):
+        self.fleets = fleets if fleets is not None else [None, None]
+        self.moves = moves if moves is not None else []
+        self.winner = winner
+
+
+class ReplayWriter():
+    """Appends recorded games to the replay file.
+       Entries are buffered and written out at the end of every game or on flush().
+    """
+    def __init__(self, path):
+        self.path = path
+        self.buffer = bytearray()
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            self.buffer += MAGIC + bytes([FORMAT_VERSION])
+
+
+    def start_game(self, fleets, geometry=board.DEFAULT_GEOMETRY):
+        if geometry is not board.DEFAULT_GEOMETRY:
+            # cell index of a move has to fit in 7 bits
+            raise ReplayException("Only games on the standard board can be recorded")
+        self.buffer.append(GAME_START)
+        for fleet in fleets:
+            self.buffer += encode_fleet(fleet)
+
+
+    def move(self, shooter, idx, hit):
+        self.buffer.append(shooter << 7 | idx)
+        self.buffer.append(HIT if hit else MISSED)
+
+
+    def sunk(self, length):
+        self.buffer.append(SUNK)
+        self.buffer.append(length)
+
+
+    def end_game(self, winner=None):
+        self.buffer.append(GAME_END)
+        self.buffer.append(NO_WINNER if winner is None else winner)
+        self.flush()
+
+
+    def flush(self):
+        if self.buffer:
+            with open(self.path, "ab") as replay_file:
+                replay_file.write(self.buffer)
+            self.buffer.clear()
+
+
+def encode_game(record):
+    """Encode the whole game record into replay entries
+    """
+    data = bytearray([GAME_START])
+    for fleet in record.fleets:
+        data += encode_fleet(fleet)
+    for shooter, idx, hit, sunk in record.moves:
+        data.append(shooter << 7 | idx)
+        data.append(HIT if hit else MISSED)
+        if sunk:
+            data.append(SUNK)
+            data.append(sunk)
+    data.append(GAME_END)
+    data.append(NO_WINNER if record.winner is None else record.winner)
+    return bytes(data)
+
+
+def parse_entries(data, pos=0):
+    """Generate GameRecord of every game stored in the replay entries, starting from the given position
+    """
+    record = None
+    size = len(data)
+    while pos < size:
+        tag = data[pos]
+        if tag == GAME_START:
+            if record is not None:
+                yield record
+            first, pos = decode_fleet(data, pos + 1)
+            second, pos = decode_fleet(data, pos)
+            record = GameRecord([first, second])
+        elif record is None:
+            raise ReplayException(f"Entry outside of a game at byte {pos}")
+        elif tag == GAME_END:
+            record.winner = None if data[pos + 1] == NO_WINNER else data[pos + 1]
+            pos += 2
+            yield record
+            record = None
+        elif tag == SUNK:
+            shooter, idx, hit, _ = record.moves[-1]
+            record.moves[-1] = (shooter, idx, hit, data[pos + 1])
+            pos += 2
+        else:
+            record.moves.append((tag >> 7, tag & 0x7F, data[pos + 1] == HIT, 0))
+            pos += 2
+    if record is not None:
+        # game still in progress when the file was written
+        yield record
+
+
+def parse_replays(data):
+    """Generate GameRecord of every game stored in the replay file data
+    """
+    if data[:len(MAGIC)] != MAGIC:
+        raise ReplayException("Not a replay file!")
+    if data[len(MAGIC)] > FORMAT_VERSION:
+        raise ReplayException(f"Unsupported replay format version: {data[len(MAGIC)]}")
+    return parse_entries(data, len(MAGIC) + 1)
+
+
+def record_messages(record):
+    """Generate the game as (shooter, message) pairs in the words of the game protocol:
+       shot coordinates, "hit" or "missed", "sunk <length>" and "gameover"
+    """
+    for shooter, idx, hit, sunk in record.moves:
+        yield shooter, board.cell_coor(idx)
+        yield 1 - shooter, "hit" if hit else "missed"
+        if sunk:
+            yield 1 - shooter, f"sunk {sunk}"
+    if record.winner is not None:
+        yield 1 - record.winner, "gameover"
+
+
+def read_replays(path):
+    with open(path, "rb") as replay_file:
+        return list(parse_replays(replay_file.read()))
+
+
+def boards_at(record, move=None):
+    """Reconstruct boards of both players after the given number of moves, all of them by default.
+       Board with unknown fleet shows only the recorded hits and misses.
+    """
+    boards = []
+    for fleet in record.fleets:
+        player_board = board.Board()
+        if fleet is not None:
+            player_board.place_fleet(fleet)
+        boards.append(player_board)
+    for shooter, idx, hit, sunk in record.moves[:move]:
+        target = boards[1 - shooter]
+        if record.fleets[1 - shooter] is not None:
+            target.shoot_cell(idx)
+        else:
+            target.set_cells(1 << idx, board.HIT_SYMBOL if hit else board.MISSED_SYMBOL)
+    return boards
+
+
+def verify(record):
+    """Replay the game against the recorded fleets and check that every recorded result
+       and the winner agree with the board logic. Moves against unknown fleets are skipped.
+    """
+    boards = boards_at(record, 0)
+    for shooter, idx, hit, sunk in record.moves:
+        if record.fleets[1 - shooter] is None:
+            continue
+        target = boards[1 - shooter]
+        if target.shoot_cell(idx) != hit:
+            return False
+        if (target.last_sunk[0] if target.last_sunk else 0) != sunk:
+            return False
+    if record.winner is not None and record.fleets[1 - record.winner] is not None:
+        return boards[1 - record.winner].ship_count == 0
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Inspect and verify recorded games')
+    parser.add_argument('path', type=str, help='replay file')
+    parser.add_argument('-g', '--game', type=int, default=None, help='display boards of the game with the given number')
+    parser.add_argument('-m', '--move', type=int, default=None, help='display boards after the given number of moves')
+    args = parser.parse_args()
+
+    records = read_replays(args.path)
+    if args.game is not None:
+        record = records[args.game]
+        print(f"Game {args.game}: {len(record.moves)} moves, winner: {record.winner}")
+        for name, player_board in zip(("FIRST", "SECOND"), boards_at(record, args.move)):
+            print(f"                   {name}")
+            player_board.print()
+        sys.exit(0)
+
+    start = time.perf_counter()
+    failed = [number for number, record in enumerate(records) if not verify(record)]
+    elapsed = time.perf_counter() - start
+    print(f"Verified {len(records)} games in {elapsed:.3f}s, {len(failed)} failed")
+    if failed:
+        print(f"Failed games: {failed[:20]}")
+        sys.exit(1)
@@ -0,0 +1,69 @@
+import time
+import heapq
+
+
+class Timer():
+    """Deferred call scheduled by Scheduler, can be cancelled until it runs"""
+    __slots__ = ("when", "callback", "args", "cancelled")
+
+    def __init__(self, when, callback, args):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Scheduler():
+    """Heap of deferred calls, driven by the caller's event loop:
+       wait for I/O at most next_timeout() seconds, then run_due().
+       Cancelled timers are only marked, and dropped once they reach the top of the heap,
+       so scheduling and cancelling take O(log n) whatever the number of pending calls.
+    """
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        # heap of (when, sequence number, timer)
+        self.timers = []
+        self.sequence = 0
+
+
+    def __len__(self):
+        return sum(1 for entry in self.timers if not entry[2].cancelled)
+
+
+    def call_at(self, when, callback, *args):
+        timer = Timer(when, callback, args)
+        heapq.heappush(self.timers, (when, self.sequence, timer))
+        self.sequence += 1
+        return timer
+
+
+    def call_later(self, delay, callback, *args):
+        return self.call_at(self.clock() + delay, callback, *args)
+
+
+    def next_timeout(self):
+        """Seconds until the earliest pending call, 0 if it is due already, None if nothing is pending
+        """
+        while self.timers:
+            when, sequence, timer = self.timers[0]
+            if not timer.cancelled:
+                return max(0.0, when - self.clock())
+            heapq.heappop(self.timers)
+        return None
+
+
+    def run_due(self):
+        """Run all the calls which are due, in the order of their deadlines. Returns number of calls run.
+        """
+        now = self.clock()
+        count = 0
+        while self.timers and self.timers[0][0] <= now:
+            timer = heapq.heappop(self.timers)[2]
+            if not timer.cancelled:
+                timer.callback(*timer.args)
+                count += 1
+        return count
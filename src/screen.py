@@ -0,0 +1,108 @@
+import sys
+import atexit
+import shutil
+import board
+
+CSI = "\033["
+SAVE_CURSOR = "\0337"
+RESTORE_CURSOR = "\0338"
+
+
+class Screen():
+    """Terminal view keeping the boards at fixed positions at the top of the screen,
+       with messages scrolling in the region below them.
+       After the first draw only the cells changed since the last update are rewritten,
+       addressed directly with the cursor, so an update after a shot takes a few bytes.
+    """
+    def __init__(self, boards, stream=None):
+        # list of (title, board)
+        self.boards = boards
+        self.stream = sys.stdout if stream is None else stream
+        # per board: (top row, left column) on the screen and the masks as last drawn
+        self.origins = []
+        self.drawn = []
+        self.height = 0
+        self.active = False
+        renderer = board.Board.renderer
+        self.renderer = renderer if isinstance(renderer, board.TextRenderer) else board.RENDERERS["plain"]
+        # per board: screen column of every board column, relative to the left edge of the board
+        self.columns = [self.board_columns(player_board.geometry) for title, player_board in boards]
+        atexit.register(self.close)
+
+
+    def board_columns(self, geometry):
+        widths = self.renderer.layout(geometry)[0]
+        columns, position = [], 1 + widths[0] + 3
+        for width in widths[1:]:
+            columns.append(position + 2 + (width - 1) // 2)
+            position += width + 3
+        return columns
+
+
+    @staticmethod
+    def state(player_board):
+        return (player_board.ships, player_board.hits, player_board.misses, player_board.marked, dict(player_board.marks))
+
+
+    def draw(self):
+        """Clear the screen and draw the boards in full, side by side if they fit
+        """
+        lines = [player_board.get_board_print_lines() for title, player_board in self.boards]
+        width = len(lines[0][0])
+        size = shutil.get_terminal_size()
+        side_by_side = width * len(self.boards) + 3 * (len(self.boards) - 1) <= size.columns
+        self.origins = []
+        output = [CSI + "r", CSI + "2J", CSI + "H"]
+        top = 1
+        for number, ((title, player_board), board_lines) in enumerate(zip(self.boards, lines)):
+            row, col = (1, 1 + number * (width + 3)) if side_by_side else (top, 1)
+            self.origins.append((row + 1, col))
+            output.append(f"{CSI}{row};{col}H{title.center(width)}")
+            for offset, line in enumerate(board_lines, 1):
+                output.append(f"{CSI}{row + offset};{col}H{line}")
+            top = row + len(board_lines) + 1
+        self.height = top if not side_by_side else len(lines[0]) + 1
+        self.drawn = [self.state(player_board) for title, player_board in self.boards]
+        # messages scroll below the boards
+        output.append(f"{CSI}{self.height + 1};{size.lines}r{CSI}{size.lines};1H")
+        self.write("".join(output))
+        self.active = True
+
+
+    def update(self):
+        """Rewrite the cells changed since the last draw or update
+        """
+        if not self.active:
+            return self.draw()
+        output = []
+        for number, (title, player_board) in enumerate(self.boards):
+            old, new = self.drawn[number], self.state(player_board)
+            if old == new:
+                continue
+            changed = (old[0] ^ new[0]) | (old[1] ^ new[1]) | (old[2] ^ new[2]) | (old[3] ^ new[3])
+            if old[4] != new[4]:
+                changed |= old[3] | new[3]
+            top, left = self.origins[number]
+            cols, columns = player_board.geometry.cols, self.columns[number]
+            while changed:
+                low = changed & -changed
+                changed ^= low
+                row, col = divmod(low.bit_length() - 1, cols)
+                symbol = player_board.symbol_at(row + 1, col + 1)
+                output.append(f"{CSI}{top + 3 + row};{left + columns[col] - 1}H{self.renderer.cell(symbol, 1)}")
+            self.drawn[number] = new
+        if output:
+            self.write(SAVE_CURSOR + "".join(output) + RESTORE_CURSOR)
+
+
+    def write(self, data):
+        self.stream.write(data)
+        self.stream.flush()
+
+
+    def close(self):
+        """Give the whole screen back to the terminal
+        """
+        if self.active:
+            self.active = False
+            self.write(f"{CSI}r{CSI}{shutil.get_terminal_size().lines};1H\n")
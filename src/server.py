@@ -4,20 +4,131 @@ import signal
 import socket
 import syslog
 import random
+import asyncio
 import argparse
-from time import sleep
+import selectors
 import board
+import protocol
+import logqueue
 from player import Player
+from strategy import STRATEGIES
+from checkpoint import Checkpoint
+from replay import ReplayWriter
+from broadcast import Broadcast, BroadcastReader, WATCH, GAMES
+from lobby import Lobby
+from openingbook import OpeningBook, BookCursor
+from scheduler import Scheduler
 
+DEFAULT_STRATEGY = "density"
+# seconds the server waits for the client to reconnect to a saved game
+RECONNECT_TIMEOUT = 60.0
+# (min seconds, max seconds) the bot waits before its replies, so that it does not answer instantly
+DEFAULT_BOT_DELAY = (1, 3)
+# longest delay a player may ask the bot for
+MAX_BOT_DELAY = 10.0
 
-class Server(Player):
-    def __init__(self, host='127.0.0.1', port=9009, daemon=False):
+
+class BotPlayer(Player):
+    """Player that guesses opponent's ships on its own, using one of the strategies.
+       First shots are taken from the opening book, if one built for the board and fleet is given.
+    """
+    # openingbook.OpeningBook shared by all the bots, see --book
+    opening_book = None
+
+    def __init__(self, host='127.0.0.1', port=9009, log_method=print, strategy=DEFAULT_STRATEGY):
+        super(BotPlayer, self).__init__(host=host, port=port, log_method=log_method)
+        self.strategy_name = strategy
+        self.strategy = None
+        self.book_cursor = None
+        self.last_shot = None
+        self.binary_protocol = True
+        # pacing of this game's replies, None or (0, 0) for none; the opponent may ask for its own in the handshake
+        self.bot_delay = DEFAULT_BOT_DELAY
+
+
+    def initialize_game(self, init_ships_method=None):
+        self.strategy = STRATEGIES[self.strategy_name](fleet=self.fleet, geometry=self.geometry)
+        book = self.opening_book
+        self.book_cursor = BookCursor(book) if book is not None and book.matches(self.geometry, self.fleet) else None
+        super(BotPlayer, self).initialize_game(init_ships_method)
+
+
+    def restore(self, snapshot):
+        super(BotPlayer, self).restore(snapshot)
+        # strategy learns the shots of the saved game again, the opening book is left
+        self.strategy = STRATEGIES[self.strategy_name](fleet=self.fleet, geometry=self.geometry)
+        self.book_cursor = None
+        self.last_shot = None
+        for idx in board.mask_cells(snapshot.opponent_misses):
+            self.strategy.record(idx, False)
+        for idx in board.mask_cells(snapshot.opponent_hits):
+            self.strategy.record(idx, True)
+        for idx, length in snapshot.opponent_sunk:
+            self.strategy.sunk(idx, length)
+
+
+    def handle_received_msg(self, msg):
+        result = msg.lower()
+        if result in ("hit", "missed") and self.last_guess_stack:
+            self.last_shot = self.geometry.coordinate_cells[self.last_guess_stack[-1]]
+            self.strategy.record(self.last_shot, result == "hit")
+            if self.book_cursor is not None:
+                self.book_cursor.record(result == "hit")
+        elif result.startswith(protocol.SUNK) and self.last_shot is not None:
+            self.strategy.sunk(self.last_shot, protocol.parse_sunk(result))
+            if self.book_cursor is not None:
+                self.book_cursor.sunk(protocol.parse_sunk(result))
+        elif result.startswith(protocol.HELLO):
+            hello = protocol.parse_hello(result)
+            pace = protocol.parse_pace(hello[1]) if hello else None
+            if pace is not None:
+                self.bot_delay = (min(pace[0], MAX_BOT_DELAY), min(pace[1], MAX_BOT_DELAY))
+        super(BotPlayer, self).handle_received_msg(msg)
+
+
+    def reply_delay(self):
+        """Seconds to wait before the next reply
+        """
+        if not self.bot_delay:
+            return 0.0
+        return random.uniform(*self.bot_delay)
+
+
+    def next_shot(self):
+        """Cell to shoot at: from the opening book while the game follows it, then chosen by the strategy
+        """
+        if self.book_cursor is not None:
+            idx = self.book_cursor.next_shot()
+            if idx is not None:
+                return idx
+            self.book_cursor = None
+        return self.strategy.next_shot()
+
+
+    def daemon_response(self):
+        guess_coor = self.geometry.cell_names[self.next_shot()]
+        self.log_debug(f"Guess coordinates: {guess_coor}")
+        self.send_message(guess_coor)
+        self.last_guess_stack.append(guess_coor)
+        self.your_turn = False
+        return guess_coor
+
+
+class Server(BotPlayer):
+    def __init__(self, host='127.0.0.1', port=9009, daemon=False, strategy=DEFAULT_STRATEGY, 
+                 log_boards=True, log_level=logqueue.INFO, bot_delay=DEFAULT_BOT_DELAY):
         self.is_daemon = daemon
-        log_method = syslog.syslog if self.is_daemon else print
-        super(Server, self).__init__(host=host, port=port, log_method=log_method)
-        
+        # daemon logs to syslog through the background writer, off the move path
+        log_method = logqueue.QueueLogger(level=log_level) if self.is_daemon else print
+        super(Server, self).__init__(host=host, port=port, log_method=log_method, strategy=strategy)
+        # boards are logged at debug level, they are not rendered at all if the daemon would discard them
+        self.log_boards = log_boards and (not self.is_daemon or log_level >= logqueue.DEBUG)
+        self.bot_delay = bot_delay
+        # replies of the bot are deferred calls of the scheduler, the process never sleeps
+        self.scheduler = Scheduler()
+        self.pending_reply = None
+
         if self.is_daemon:
-            self.guess_list = board.Board.generate_all_fields_list()
             self.connect_daemon()
         else: 
             self.connect()
@@ -51,8 +162,25 @@ class Server(Player):
         self.conn_socket, addr = self.server_socket.accept()
         self.log(f"Client: {addr} connected")
 
+
+    def reconnect(self):
+        """Wait for the client to connect again, at most RECONNECT_TIMEOUT seconds
+        """
+        self.conn_socket.close()
+        self.server_socket.settimeout(RECONNECT_TIMEOUT)
+        try:
+            self.conn_socket, addr = self.server_socket.accept()
+        except socket.timeout:
+            logqueue.at_level(self.log, logqueue.WARNING)("Client did not reconnect")
+            return False
+        finally:
+            self.server_socket.settimeout(None)
+        self.log(f"Client: {addr} reconnected")
+        return True
+
     
-    def daemonize(self, uid):
+    @staticmethod
+    def daemonize(uid):
         """Daemonize process. UNIX double fork mechanism."""
 
         try:
@@ -96,34 +224,367 @@ class Server(Player):
  
 
     def run_bot(self):
-        self.initialize_game(init_ships_method="random")
-        self.local_board.log_boardstate_to_syslog()
+        self.start_game(init_ships_method="random")
+        if self.log_boards:
+            self.local_board.print(self.log_debug)
+        selector = selectors.DefaultSelector()
+        selector.register(self.conn_socket, selectors.EVENT_READ)
         while True:
-            msg = self.get_data_from_opponent(self.conn_socket)
-            self.handle_received_msg(msg)
-            if self.your_turn is True:
-                sleep(random.randint(1, 3))
-                self.daemon_response()
+            # wait for the opponent, but no longer than until the next deferred reply
+            if selector.select(self.scheduler.next_timeout()):
+                # whole batch is handled first, so that the sunk message following a hit is known before shooting
+                connection = self.conn_socket
+                msgs = self.get_data_from_opponent(connection)
+                self.follow_connection(selector, connection)
+                for msg in msgs:
+                    self.handle_received_msg(msg)
+                if self.your_turn is True and self.pending_reply is None:
+                    self.pending_reply = self.scheduler.call_later(self.reply_delay(), self.reply)
+            self.scheduler.run_due()
+            self.flush_messages()
 
 
-    def daemon_response(self):
-        guess_coor = random.choice(self.guess_list)
-        self.log(f"Guess coordinates: {guess_coor}")
-        self.send_message(guess_coor)
-        self.last_guess_stack.append(guess_coor)
-        self.guess_list.remove(guess_coor)
+    def reply(self):
+        self.pending_reply = None
+        self.daemon_response()
+
+
+def quiet(*args):
+    pass
+
+
+class BotSession(BotPlayer):
+    """Bot game played against a single client of AsyncServer"""
+    def __init__(self, writer, log_method=quiet, strategy=DEFAULT_STRATEGY):
+        super(BotSession, self).__init__(log_method=log_method, strategy=strategy)
+        self.stream = writer
         self.your_turn = False
-        return guess_coor
+        self.finished = False
+        self.log_boards = False
+        # broadcast.Broadcast passing the bot's messages on to the spectators, as player 1
+        self.broadcast = None
+
+
+    def flush_messages(self):
+        if self.writer.pending:
+            if self.broadcast is not None:
+                self.broadcast.publish_all(1, self.writer.pending)
+            self.stream.write(self.writer.take())
+
+
+    def display_prompt(self, actor="Me"):
+        pass
+
+
+    def end_game(self):
+        self.finished = True
+
+
+    def handle_received_msg(self, msg):
+        super(BotSession, self).handle_received_msg(msg)
+        if self.local_board.count_symbols(board.SHIP_SYMBOL) == 0:
+            self.finished = True
+
+
+class AsyncServer():
+    """Server hosting many games at once on a single port. 
+       Each connected client waits up to pair_timeout seconds for another client to play with, 
+       otherwise it gets a bot opponent. Every game runs as a separate asyncio task.
+       Waiting clients are kept in a Lobby, optionally paired by the rating given in their handshake
+       (see rating_window), and the lobby state is logged every stats_interval seconds.
+       If spectator_port is given, spectators connecting to it can list the games with "games"
+       and follow any of them with "watch <game id>", or just "watch" for the latest one.
+       Clients are accepted on the given listening socket instead of the port if sock is given,
+       e.g. the one shared by the workers of pool.BotPool.
+    """
+    def __init__(self, host='127.0.0.1', port=9009, pair_timeout=5.0, bot_delay=DEFAULT_BOT_DELAY, log_method=print, 
+                 strategy=DEFAULT_STRATEGY, spectator_port=None, rating_window=None, stats_interval=60.0, sock=None):
+        self.host = host
+        self.port = port
+        self.sock = sock
+        self.spectator_port = spectator_port
+        self.strategy = strategy
+        self.pair_timeout = pair_timeout
+        self.bot_delay = bot_delay
+        self.log = log_method
+        self.lobby = Lobby(rating_window)
+        self.lobby_changed = None
+        self.stats_interval = stats_interval
+        self.games_running = 0
+        self.games_played = 0
+        # game id -> Broadcast of the running games
+        self.games = dict()
+        self.next_game_id = 0
+
+
+    def run(self):
+        asyncio.run(self.serve())
+
+
+    async def serve(self):
+        self.lobby_changed = asyncio.Event()
+        if self.sock is not None:
+            server = await asyncio.start_server(self.handle_client, sock=self.sock)
+        else:
+            server = await asyncio.start_server(self.handle_client, '', self.port, backlog=1024)
+        self.log(f"Battleship multi-game server started on {self.host}:{self.port}")
+        tasks = [asyncio.create_task(self.expire_waiting())]
+        if self.stats_interval:
+            tasks.append(asyncio.create_task(self.report_lobby()))
+        if self.spectator_port:
+            await asyncio.start_server(self.handle_spectator, '', self.spectator_port, backlog=1024)
+            self.log(f"Spectators accepted on {self.host}:{self.spectator_port}")
+        async with server:
+            await server.serve_forever()
+
+
+    async def handle_spectator(self, reader, writer):
+        try:
+            words = (await reader.readline()).decode(protocol.ENCODING).split()
+            if words == [GAMES]:
+                writer.write(protocol.encode_messages([" ".join([GAMES] + [str(game_id) for game_id in self.games])]))
+                return
+            if not words or words[0] != WATCH or len(words) > 2 or (len(words) == 2 and not words[1].isdigit()):
+                writer.write(b"error unknown command\n")
+                return
+            game_id = int(words[1]) if len(words) == 2 else max(self.games, default=None)
+            broadcast = self.games.get(game_id)
+            if broadcast is None:
+                writer.write(b"error no such game\n")
+                return
+            writer.write(f"{WATCH} {game_id}\n".encode(protocol.ENCODING))
+            broadcast.subscribe(writer)
+            # spectator stays until it disconnects, the game ends or it falls behind
+            await reader.read()
+            broadcast.unsubscribe(writer)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+    async def handle_client(self, reader, writer):
+        # handshake tells the rating of the client, it is passed on to the opponent when the game starts
+        hello = await reader.readline()
+        if not hello:
+            writer.close()
+            return
+        parsed = protocol.parse_hello(hello.decode(protocol.ENCODING, errors="replace").strip())
+        rating = protocol.parse_rating(parsed[1]) if parsed else None
+        try:
+            # only clients playing on the same board with the same fleet are paired
+            size, fleet = protocol.parse_board(parsed[1]) if parsed else (None, None)
+        except protocol.ProtocolException as e:
+            logqueue.at_level(self.log, logqueue.WARNING)(f"Client rejected: {str(e)}")
+            writer.close()
+            return
+        client = (reader, writer, hello)
+
+        partner = None
+        if self.pair_timeout:
+            waiting = asyncio.get_running_loop().create_future()
+            pool = (size or (board.BOARD_ROWS, board.BOARD_COLS), tuple(fleet or board.FLEET))
+            entry = (client, waiting)
+            opponent = self.lobby.join(entry, rating, pool)
+            if opponent is not None:
+                # hand the connection over to the client that waits for a partner
+                opponent[1].set_result(client)
+                return
+            self.lobby_changed.set()
+            received = bytearray(hello)
+            if not await self.wait_in_lobby(entry, reader, received):
+                writer.close()
+                return
+            hello = bytes(received)
+            client = (reader, writer, hello)
+            partner = waiting.result()
+
+        self.games_running += 1
+        game_id, broadcast = self.next_game_id, Broadcast()
+        self.next_game_id += 1
+        self.games[game_id] = broadcast
+        try:
+            if partner is None:
+                await self.play_bot_game(reader, writer, broadcast, hello)
+            else:
+                await self.play_match(client, partner, broadcast)
+        except Exception as e:
+            logqueue.at_level(self.log, logqueue.WARNING)(f"Game aborted: {str(e)}")
+        finally:
+            self.games_running -= 1
+            self.games_played += 1
+            del self.games[game_id]
+            broadcast.close()
+            writer.close()
+            if partner is not None:
+                partner[1].close()
+
+
+    async def wait_in_lobby(self, entry, reader, received):
+        """Wait until the queued client gets a partner or a bot, collecting the data it sends meanwhile in received.
+           Returns False if the client disconnected, it is removed from the lobby then.
+        """
+        waiting = entry[1]
+        try:
+            while not waiting.done():
+                reading = asyncio.ensure_future(reader.read(protocol.RECV_BUFFER))
+                await asyncio.wait([reading, waiting], return_when=asyncio.FIRST_COMPLETED)
+                if not reading.done():
+                    reading.cancel()
+                    break
+                try:
+                    data = reading.result()
+                except ConnectionError:
+                    data = b""
+                if not data:
+                    self.lobby.leave(entry)
+                    return False
+                received += data
+        except asyncio.CancelledError:
+            self.lobby.leave(entry)
+            raise
+        return True
+
+
+    async def expire_waiting(self):
+        """Give a bot opponent to every client waiting for a partner longer than pair_timeout
+        """
+        while True:
+            oldest = self.lobby.oldest()
+            if oldest is None:
+                self.lobby_changed.clear()
+                await self.lobby_changed.wait()
+                continue
+            await asyncio.sleep(max(0.0, oldest + self.pair_timeout - self.lobby.clock()))
+            for client, waiting in self.lobby.expire(self.pair_timeout):
+                waiting.set_result(None)
+
+
+    async def report_lobby(self):
+        while True:
+            await asyncio.sleep(self.stats_interval)
+            self.log(self.lobby.report())
+
+
+    async def play_match(self, first, second, broadcast=None):
+        """Pass messages between two clients, given as (reader, writer, handshake already read), 
+           the one that connected first starts the game
+        """
+        first_spectators = broadcast and BroadcastReader(broadcast, 0)
+        second_spectators = broadcast and BroadcastReader(broadcast, 1)
+        second[1].write(b"wait\n" + first[2])
+        first[1].write(second[2])
+        for handshake, spectators in ((first[2], first_spectators), (second[2], second_spectators)):
+            if spectators is not None:
+                spectators.feed(handshake)
+        await asyncio.gather(self.relay(first[0], first[1], second[1], first_spectators), 
+                             self.relay(second[0], second[1], first[1], second_spectators))
+
+
+    async def relay(self, reader, writer, destination, spectators=None):
+        while True:
+            data = await reader.read(protocol.RECV_BUFFER)
+            if not data:
+                destination.close()
+                writer.close()
+                return
+            destination.write(data)
+            if spectators is not None:
+                spectators.feed(data)
+            await destination.drain()
+
+
+    async def play_bot_game(self, reader, writer, broadcast=None, received=b""):
+        """Play the bot against the client, received being the data already read from the client
+        """
+        session = BotSession(writer, strategy=self.strategy)
+        session.broadcast = broadcast
+        session.bot_delay = self.bot_delay
+        # bot plays on the board announced by the client
+        first_line = received.split(protocol.SEPARATOR, 1)[0]
+        hello = protocol.parse_hello(first_line.decode(protocol.ENCODING, errors="replace").strip())
+        size, fleet = protocol.parse_board(hello[1]) if hello else (None, None)
+        session.geometry = board.geometry(*size) if size else board.DEFAULT_GEOMETRY
+        session.fleet = fleet or board.FLEET
+        session.initialize_game(init_ships_method="random")
+        await writer.drain()
+        while not session.finished:
+            data = received or await reader.read(protocol.RECV_BUFFER)
+            received = b""
+            if not data:
+                return
+            for msg in session.reader.feed(data):
+                if broadcast is not None:
+                    broadcast.publish(0, msg)
+                session.handle_received_msg(msg)
+                if session.finished:
+                    break
+            if session.your_turn is True and not session.finished:
+                delay = session.reply_delay()
+                if delay:
+                    # the game's task is parked on the event loop's timer heap until the reply is due
+                    session.flush_messages()
+                    await writer.drain()
+                    await asyncio.sleep(delay)
+                session.daemon_response()
+            session.flush_messages()
+            await writer.drain()
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='')
     parser.add_argument('-s', '--server', type=str, default="127.0.0.1", help='IP of the server')
     parser.add_argument('-p', '--port', type=int, default=9009, help='port used for the connection')
+    parser.add_argument('--record', type=str, default=None, help='append the game to the given replay file')
+    parser.add_argument('--render', type=str, default="plain", choices=board.RENDERERS.keys(), help='how boards are displayed')
     parser.add_argument('-b', '--bot', action='store_true', help='Specify this option if you want to spawn a bot to play with')
+    parser.add_argument('-m', '--multi', action='store_true', help='Host many games at once, pairing connected clients or giving them bots')
+    parser.add_argument('--spectator-port', type=int, default=None, help='port accepting spectators of the running games (multi-game mode)')
+    parser.add_argument('--rating-window', type=int, default=None, help='pair only clients whose ratings differ by at most this much (multi-game mode)')
+    parser.add_argument('--pair-timeout', type=float, default=5.0, help='seconds a client waits for a partner before getting a bot (multi-game mode)')
+    parser.add_argument('--strategy', type=str, default=DEFAULT_STRATEGY, choices=STRATEGIES.keys(), help='guessing strategy of the bot')
+    parser.add_argument('--no-board-log', action='store_true', help='do not log boards after every shot (bot mode)')
+    parser.add_argument('--log-level', type=str, default="info", choices=("error", "warning", "info", "debug"), 
+                        help='least severe messages logged to syslog (bot mode)')
+    parser.add_argument('--bot-delay', type=str, default="1-3", help='seconds the bot waits before its replies, as MIN-MAX or 0')
+    parser.add_argument('--book', type=str, default=None, help='opening book of the bot, built by openingbook.py')
+    parser.add_argument('--checkpoint', type=str, default=None, help='save the game to the given file after every move and resume it from there (single game mode)')
+    parser.add_argument('--size', type=str, default=None, help='size of the board as ROWSxCOLS, 10x10 by default (single game mode)')
+    parser.add_argument('--fleet', type=str, default=None, help='comma separated ship lengths, 4,3,3,2,2,2,1,1,1,1 by default (single game mode)')
     args = parser.parse_args()
+    board.Board.renderer = board.RENDERERS[args.render]
+    try:
+        geometry, fleet = board.board_config(args.size, args.fleet)
+        bot_delay = protocol.parse_delay(args.bot_delay)
+    except (board.BoardBaseException, protocol.ProtocolException) as e:
+        parser.error(str(e))
+    if args.record and geometry is not board.DEFAULT_GEOMETRY:
+        parser.error("Replays can be recorded only on the standard board")
+    if args.book:
+        # mapped lazily by the first bot, forked bots share the mapping
+        BotPlayer.opening_book = OpeningBook(os.path.abspath(args.book))
+
+    if args.multi:
+        multi_server = AsyncServer(host=args.server, port=args.port, pair_timeout=0 if args.bot else args.pair_timeout, 
+                                   strategy=args.strategy, spectator_port=args.spectator_port, 
+                                   rating_window=args.rating_window, bot_delay=bot_delay)
+        try:
+            multi_server.run()
+        except KeyboardInterrupt:
+            print("Ctrl+C entered, closing server...")
+        sys.exit(0)
 
-    instance = Server(host=args.server, port=args.port, daemon=args.bot)
+    record_path = os.path.abspath(args.record) if args.record else None
+    # daemon changes its working directory
+    checkpoint_path = os.path.abspath(args.checkpoint) if args.checkpoint else None
+    instance = Server(host=args.server, port=args.port, daemon=args.bot, strategy=args.strategy, 
+                      log_boards=not args.no_board_log, log_level=getattr(logqueue, args.log_level.upper()),
+                      bot_delay=bot_delay)
+    instance.geometry, instance.fleet = geometry, fleet
+    if record_path:
+        instance.replay = ReplayWriter(record_path)
+    if checkpoint_path:
+        instance.checkpoint = Checkpoint(checkpoint_path)
     try:
         if args.bot:
             instance.run_bot()
@@ -134,6 +595,6 @@ if __name__ == "__main__":
         instance.conn_socket.close()
         instance.server_socket.close()
     except Exception as e:
-        instance.log(str(e))
+        logqueue.at_level(instance.log, logqueue.ERROR)(str(e))
         instance.conn_socket.close()
         instance.server_socket.close()
@@ -0,0 +1,94 @@
+import random
+import argparse
+import board
+from strategy import STRATEGIES
+from replay import ReplayWriter
+
+
+def play_game(strategies, rng=random, fleet=board.FLEET, replay=None, geometry=board.DEFAULT_GEOMETRY):
+    """Play a single game between two strategies on in-memory boards, first strategy starts.
+       As in the real game, the player who hits shoots again. Game is recorded if replay writer is given.
+       Returns index of the winning strategy and number of shots it fired.
+    """
+    boards = []
+    fleets = []
+    for _ in strategies:
+        player_board = board.Board(geometry, fleet)
+        fleets.append(board.random_fleet(fleet, rng, geometry=geometry))
+        player_board.place_fleet(fleets[-1])
+        boards.append(player_board)
+    if replay is not None:
+        replay.start_game(fleets, geometry)
+    shots = [0, 0]
+    turn = 0
+    while True:
+        strategy = strategies[turn]
+        target = boards[1 - turn]
+        idx = strategy.next_shot()
+        shots[turn] += 1
+        hit = target.shoot_cell(idx)
+        sunk = target.last_sunk[0] if target.last_sunk else None
+        strategy.record(idx, hit, sunk)
+        if replay is not None:
+            replay.move(turn, idx, hit)
+            if sunk:
+                replay.sunk(sunk)
+        if hit:
+            if not target.ships:
+                if replay is not None:
+                    replay.end_game(turn)
+                return turn, shots[turn]
+        else:
+            turn = 1 - turn
+
+
+def simulate(games, first="random", second="random", seed=None, fleet=board.FLEET, replay=None, geometry=board.DEFAULT_GEOMETRY):
+    """Play given number of games between two strategies, alternating the starting player.
+       Returns dictionary with number of wins, total and average number of shots to win of each strategy.
+    """
+    rng = random.Random(seed)
+    names = (first, second)
+    wins = [0, 0]
+    shots_to_win = [0, 0]
+    for game in range(games):
+        order = (0, 1) if game % 2 == 0 else (1, 0)
+        strategies = [STRATEGIES[names[player]](rng, fleet, geometry) for player in order]
+        winner, shots = play_game(strategies, rng, fleet, replay, geometry)
+        winner = order[winner]
+        wins[winner] += 1
+        shots_to_win[winner] += shots
+    return {
+        "games": games,
+        "strategies": list(names),
+        "wins": wins,
+        "shots_to_win": shots_to_win,
+        "win_rate": [win / games if games else 0.0 for win in wins],
+        "avg_shots_to_win": [total / win if win else 0.0 for total, win in zip(shots_to_win, wins)],
+    }
+
+
+def print_report(stats, log_method=print):
+    log_method(f"Games played: {stats['games']}")
+    for name, win_rate, shots in zip(stats["strategies"], stats["win_rate"], stats["avg_shots_to_win"]):
+        log_method(f"{name:>12}: win rate {win_rate:6.2%}, average shots to win {shots:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Play bot strategies against each other without any network')
+    parser.add_argument('-n', '--games', type=int, default=1000, help='number of games to play')
+    parser.add_argument('-1', '--first', type=str, default="random", choices=STRATEGIES.keys(), help='strategy of the first player')
+    parser.add_argument('-2', '--second', type=str, default="random", choices=STRATEGIES.keys(), help='strategy of the second player')
+    parser.add_argument('--seed', type=int, default=None, help='seed of the random generator, for reproducible results')
+    parser.add_argument('--record', type=str, default=None, help='append all the games to the given replay file')
+    parser.add_argument('--size', type=str, default=None, help='size of the board as ROWSxCOLS, 10x10 by default')
+    parser.add_argument('--fleet', type=str, default=None, help='comma separated ship lengths, 4,3,3,2,2,2,1,1,1,1 by default')
+    args = parser.parse_args()
+
+    try:
+        geometry, fleet = board.board_config(args.size, args.fleet)
+    except board.BoardBaseException as e:
+        parser.error(str(e))
+    if args.record and geometry is not board.DEFAULT_GEOMETRY:
+        parser.error("Replays can be recorded only on the standard board")
+    replay = ReplayWriter(args.record) if args.record else None
+    print_report(simulate(args.games, args.first, args.second, args.seed, fleet, replay, geometry))
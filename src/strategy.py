@@ -0,0 +1,306 @@
+import abc
+import random
+import board
+import heatmap
+
+
+class Tables():
+    """Cell tables of the board geometry used by the strategies.
+       Placement tables are built per ship length only once some strategy asks for them,
+       so that large boards pay just for the lengths of their fleet.
+    """
+    def __init__(self, geometry):
+        self.geometry = geometry
+        self.cells = geometry.cells
+        rows, cols = geometry.rows, geometry.cols
+        # Cells adjacent to every cell: orthogonally, and all the neighbours
+        self.orthogonal = [[geometry.cell_index(row2, col2)
+                            for row2, col2 in ((row - 1, col), (row + 1, col), (row, col - 1), (row, col + 1))
+                            if 1 <= row2 <= rows and 1 <= col2 <= cols]
+                           for row in range(1, rows + 1) for col in range(1, cols + 1)]
+        self.neighbours = [[cell for cell in board.mask_cells(geometry.neighbourhood_masks[idx]) if cell != idx]
+                           for idx in range(self.cells)]
+        self.placement_cells, self.placements_covering, self.placements_touching = dict(), dict(), dict()
+
+
+    def placement_table(self, length):
+        """Cells of every placement of the ship with the given length, ids of placements covering every cell
+           and ids of placements touching every cell, that is having it in the halo but not in the ship.
+        """
+        if length not in self.placement_cells:
+            cells, covering, touching = [], [[] for _ in range(self.cells)], [[] for _ in range(self.cells)]
+            if self.geometry.fleet_fits([length]):
+                for pid, (ship, halo, key) in enumerate(self.geometry.placements(length)):
+                    cells.append(board.mask_cells(ship))
+                    for idx in board.mask_cells(halo):
+                        (covering if ship & (1 << idx) else touching)[idx].append(pid)
+            self.placement_cells[length] = cells
+            self.placements_covering[length] = covering
+            self.placements_touching[length] = touching
+        return self.placement_cells[length], self.placements_covering[length], self.placements_touching[length]
+
+
+TABLES = dict()
+
+
+def tables(geometry=board.DEFAULT_GEOMETRY):
+    """Get the Tables shared by all the strategies playing on boards of the geometry
+    """
+    shared = TABLES.get(geometry)
+    if shared is None:
+        shared = TABLES[geometry] = Tables(geometry)
+    return shared
+
+
+class Strategy(abc.ABC):
+    """Base class of the bot guessing strategies.
+       Cells are given as indexes of the board masks, see board.Geometry.cell_index().
+    """
+    def __init__(self, rng=random, fleet=board.FLEET, geometry=board.DEFAULT_GEOMETRY):
+        self.rng = rng
+        self.fleet = fleet
+        self.geometry = geometry
+        self.tables = tables(geometry)
+
+
+    @abc.abstractmethod
+    def next_shot(self):
+        """Get index of the cell to shoot at next
+        """
+
+
+    def record(self, idx, hit, sunk=None):
+        """Learn the result of the shot at the given cell.
+           If the shot sunk a ship, sunk is the length of that ship.
+        """
+        if hit and sunk:
+            self.sunk(idx, sunk)
+
+
+    def sunk(self, idx, length):
+        """Learn that the hit at the given cell sunk a ship of the given length
+        """
+        pass
+
+
+class RandomStrategy(Strategy):
+    """Shoots at random cells, never at the same cell twice"""
+    def __init__(self, rng=random, fleet=board.FLEET, geometry=board.DEFAULT_GEOMETRY):
+        super(RandomStrategy, self).__init__(rng, fleet, geometry)
+        self.cells = list(range(geometry.cells))
+        rng.shuffle(self.cells)
+        # cells shot at, also those chosen by someone else, e.g. the opening book
+        self.shot = bytearray(geometry.cells)
+
+
+    def next_shot(self):
+        while True:
+            idx = self.cells.pop()
+            if not self.shot[idx]:
+                return idx
+
+
+    def record(self, idx, hit, sunk=None):
+        self.shot[idx] = 1
+        super(RandomStrategy, self).record(idx, hit, sunk)
+
+
+class HuntTargetStrategy(Strategy):
+    """Hunts at random on a checkerboard pattern, as every ship longer than one square covers both colours.
+       After a hit it targets the orthogonal neighbours of the hit.
+       Since ships cannot touch, diagonal neighbours of a hit and all the neighbours of a sunk ship are skipped.
+    """
+    def __init__(self, rng=random, fleet=board.FLEET, geometry=board.DEFAULT_GEOMETRY):
+        super(HuntTargetStrategy, self).__init__(rng, fleet, geometry)
+        self.known = bytearray(geometry.cells)
+        self.targets = []
+        self.hits = []
+        even = [idx for idx in range(geometry.cells) if sum(divmod(idx, geometry.cols)) % 2 == 0]
+        odd = [idx for idx in range(geometry.cells) if sum(divmod(idx, geometry.cols)) % 2 == 1]
+        rng.shuffle(even)
+        rng.shuffle(odd)
+        # popped from the end, so even cells go first
+        self.hunt_cells = odd + even
+
+
+    def next_shot(self):
+        while self.targets:
+            idx = self.targets.pop()
+            if not self.known[idx]:
+                return idx
+        return self.hunt()
+
+
+    def hunt(self):
+        while self.hunt_cells:
+            idx = self.hunt_cells.pop()
+            if not self.known[idx]:
+                return idx
+        raise IndexError("No cells left to shoot at")
+
+
+    def record(self, idx, hit, sunk=None):
+        self.known[idx] = 1
+        if not hit:
+            return
+        self.hits.append(idx)
+        orthogonal = self.tables.orthogonal[idx]
+        for cell in self.tables.neighbours[idx]:
+            if cell not in orthogonal:
+                self.known[cell] = 1
+        self.targets.extend(cell for cell in orthogonal if not self.known[cell])
+        super(HuntTargetStrategy, self).record(idx, hit, sunk)
+
+
+    def sunk(self, idx, length):
+        for cell in self.ship_cells(idx):
+            self.hits.remove(cell)
+            for neighbour in self.tables.neighbours[cell]:
+                self.known[neighbour] = 1
+        self.targets.clear()
+
+
+    def ship_cells(self, idx):
+        """Cells of the ship containing the hit cell, as far as they are hit
+        """
+        ship, stack = {idx}, [idx]
+        while stack:
+            for cell in self.tables.orthogonal[stack.pop()]:
+                if cell in self.hits and cell not in ship:
+                    ship.add(cell)
+                    stack.append(cell)
+        return ship
+
+
+class HeatmapStrategy(HuntTargetStrategy):
+    """Targets hits like HuntTargetStrategy, but hunts at the hottest cell of the placement heatmap
+       of the remaining ships, computed by the heatmap module.
+    """
+    def __init__(self, rng=random, fleet=board.FLEET, geometry=board.DEFAULT_GEOMETRY):
+        super(HeatmapStrategy, self).__init__(rng, fleet, geometry)
+        self.remaining = heatmap.remaining_fleet(fleet)
+
+
+    def sunk(self, idx, length):
+        super(HeatmapStrategy, self).sunk(idx, length)
+        if self.remaining.get(length):
+            self.remaining[length] -= 1
+
+
+    def hunt(self):
+        blocked = 0
+        for idx, known in enumerate(self.known):
+            if known:
+                blocked |= 1 << idx
+        rows = heatmap.heatmap(blocked, self.remaining, self.geometry)
+        heat = [value for row in rows for value in row]
+        candidates = [idx for idx in range(self.geometry.cells) if not self.known[idx]]
+        if not candidates:
+            raise IndexError("No cells left to shoot at")
+        best = max(heat[idx] for idx in candidates)
+        return self.rng.choice([idx for idx in candidates if heat[idx] == best])
+
+
+class DensityStrategy(Strategy):
+    """Shoots at the cell covered by the largest number of legal placements of the remaining ships.
+       While there are hits of not yet sunk ships, only placements covering those hits are counted.
+       Placement counts are updated incrementally: a miss removes placements covering the cell,
+       a hit removes placements touching the cell, as ships cannot touch each other.
+    """
+    def __init__(self, rng=random, fleet=board.FLEET, geometry=board.DEFAULT_GEOMETRY):
+        super(DensityStrategy, self).__init__(rng, fleet, geometry)
+        self.remaining = {length: fleet.count(length) for length in set(fleet)}
+        for length in self.remaining:
+            self.tables.placement_table(length)
+        self.alive = {length: bytearray(b"\x01" * len(self.tables.placement_cells[length])) for length in self.remaining}
+        self.counts = dict()
+        for length in self.remaining:
+            counts = [0] * geometry.cells
+            for cells in self.tables.placement_cells[length]:
+                for idx in cells:
+                    counts[idx] += 1
+            self.counts[length] = counts
+        self.shot = bytearray(geometry.cells)
+        self.hits = set()
+
+
+    def remove_placements(self, length, pids):
+        alive, counts, cells = self.alive[length], self.counts[length], self.tables.placement_cells[length]
+        for pid in pids:
+            if alive[pid]:
+                alive[pid] = 0
+                for idx in cells[pid]:
+                    counts[idx] -= 1
+
+
+    def record(self, idx, hit, sunk=None):
+        self.shot[idx] = 1
+        if not hit:
+            for length in self.remaining:
+                self.remove_placements(length, self.tables.placements_covering[length][idx])
+            return
+        self.hits.add(idx)
+        for length in self.remaining:
+            self.remove_placements(length, self.tables.placements_touching[length][idx])
+        super(DensityStrategy, self).record(idx, hit, sunk)
+
+
+    def sunk(self, idx, length):
+        ship = {idx}
+        stack = [idx]
+        while stack:
+            for cell in self.tables.orthogonal[stack.pop()]:
+                if cell in self.hits and cell not in ship:
+                    ship.add(cell)
+                    stack.append(cell)
+        self.hits -= ship
+        if self.remaining.get(length):
+            self.remaining[length] -= 1
+        # no other ship can lie on the sunk one
+        for cell in ship:
+            for remaining_length in self.remaining:
+                self.remove_placements(remaining_length, self.tables.placements_covering[remaining_length][cell])
+
+
+    def target_scores(self):
+        """Scores of the cells covered by placements going through the hits of not yet sunk ships
+        """
+        scores = dict()
+        for hit in self.hits:
+            for length, remaining in self.remaining.items():
+                if not remaining:
+                    continue
+                alive, cells = self.alive[length], self.tables.placement_cells[length]
+                for pid in self.tables.placements_covering[length][hit]:
+                    if alive[pid]:
+                        for idx in cells[pid]:
+                            if not self.shot[idx]:
+                                scores[idx] = scores.get(idx, 0) + remaining
+        return scores
+
+
+    def density_scores(self):
+        scores = dict()
+        weighted = [(remaining, self.counts[length]) for length, remaining in self.remaining.items() if remaining]
+        for idx in range(self.geometry.cells):
+            if not self.shot[idx]:
+                scores[idx] = sum(remaining * counts[idx] for remaining, counts in weighted)
+        return scores
+
+
+    def next_shot(self):
+        scores = self.target_scores() if self.hits else None
+        if not scores:
+            scores = self.density_scores()
+        if not scores:
+            raise IndexError("No cells left to shoot at")
+        best = max(scores.values())
+        return self.rng.choice([idx for idx, score in scores.items() if score == best])
+
+
+STRATEGIES = {
+    "random": RandomStrategy,
+    "hunt_target": HuntTargetStrategy,
+    "heatmap": HeatmapStrategy,
+    "density": DensityStrategy,
+}
@@ -0,0 +1,97 @@
+import os
+import math
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from simulator import simulate
+from strategy import STRATEGIES
+
+DEFAULT_SHARD_SIZE = 5000
+Z_95 = 1.959964
+
+
+def wilson_interval(wins, games, z=Z_95):
+    """Wilson score confidence interval of the win rate, 95% by default
+    """
+    if games == 0:
+        return 0.0, 0.0
+    rate = wins / games
+    denominator = 1 + z * z / games
+    centre = (rate + z * z / (2 * games)) / denominator
+    margin = z * math.sqrt(rate * (1 - rate) / games + z * z / (4 * games * games)) / denominator
+    return centre - margin, centre + margin
+
+
+def shard_seed(seed, pairing, shard):
+    """Seed of a single shard, so that the results do not depend on the number of workers
+    """
+    return None if seed is None else f"{seed}:{pairing}:{shard}"
+
+
+def plan_shards(strategies, games, shard_size=DEFAULT_SHARD_SIZE, seed=None):
+    """Split games of every pair of strategies into shards.
+       Returns list of (games, first, second, seed) tuples, arguments of simulate().
+    """
+    pairings = list(itertools.combinations(strategies, 2)) if len(strategies) > 1 else [(strategies[0], strategies[0])]
+    shards = []
+    for pairing, (first, second) in enumerate(pairings):
+        for shard, start in enumerate(range(0, games, shard_size)):
+            shards.append((min(shard_size, games - start), first, second, shard_seed(seed, pairing, shard)))
+    return shards
+
+
+class TournamentResults():
+    """Aggregates results of the shards as soon as they come"""
+    def __init__(self):
+        self.games = dict()
+        self.wins = dict()
+        self.shots_to_win = dict()
+        self.pairings = dict()
+
+
+    def add(self, stats):
+        for name, wins, shots in zip(stats["strategies"], stats["wins"], stats["shots_to_win"]):
+            self.games[name] = self.games.get(name, 0) + stats["games"]
+            self.wins[name] = self.wins.get(name, 0) + wins
+            self.shots_to_win[name] = self.shots_to_win.get(name, 0) + shots
+        pairing = tuple(stats["strategies"])
+        games, wins = self.pairings.get(pairing, (0, 0))
+        self.pairings[pairing] = (games + stats["games"], wins + stats["wins"][0])
+
+
+    def report(self, log_method=print):
+        log_method(f"{'strategy':>12} {'games':>10} {'wins':>10} {'win rate':>9} {'95% CI':>17} {'shots to win':>13}")
+        for name in sorted(self.games, key=lambda name: self.wins[name] / self.games[name], reverse=True):
+            games, wins = self.games[name], self.wins[name]
+            low, high = wilson_interval(wins, games)
+            shots = self.shots_to_win[name] / wins if wins else 0.0
+            log_method(f"{name:>12} {games:>10} {wins:>10} {wins / games:>9.2%} [{low:6.2%}, {high:6.2%}] {shots:>13.2f}")
+        for (first, second), (games, wins) in self.pairings.items():
+            log_method(f"{first} vs {second}: {wins}/{games} won by {first}")
+
+
+def run_tournament(strategies, games, workers=None, shard_size=DEFAULT_SHARD_SIZE, seed=None, progress=None):
+    """Play games between every pair of strategies, spread across worker processes
+    """
+    results = TournamentResults()
+    shards = plan_shards(strategies, games, shard_size, seed)
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = [executor.submit(simulate, *shard) for shard in shards]
+        for done, future in enumerate(as_completed(futures), 1):
+            results.add(future.result())
+            if progress is not None:
+                progress(done, len(futures))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Play bot strategies against each other on all the cores')
+    parser.add_argument('-n', '--games', type=int, default=100000, help='number of games played by every pair of strategies')
+    parser.add_argument('-s', '--strategies', type=str, nargs='+', default=list(STRATEGIES), choices=STRATEGIES.keys(), help='strategies taking part')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='number of worker processes, all cores by default')
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE, help='number of games played by a worker at once')
+    parser.add_argument('--seed', type=int, default=None, help='seed of the random generators, for reproducible results')
+    args = parser.parse_args()
+
+    progress = lambda done, total: print(f"\rShards done: {done}/{total}", end="" if done < total else "\n")
+    run_tournament(args.strategies, args.games, args.workers, args.shard_size, args.seed, progress).report()
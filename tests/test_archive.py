@@ -0,0 +1,58 @@
+import pytest
+from archive import GameArchive, ArchiveException, build_archive
+from replay import ReplayWriter, read_replays, record_messages, verify
+from simulator import simulate
+
+
+@pytest.fixture
+def records(tmp_path):
+    path = str(tmp_path / "games.bsr")
+    simulate(30, "density", "random", seed=5, replay=ReplayWriter(path))
+    return read_replays(path)
+
+
+def test_archive_round_trip(tmp_path, records):
+    path = str(tmp_path / "games.bsa")
+    build_archive(path, records, first_id=100)
+    with GameArchive(path) as archive:
+        assert len(archive) == 30
+        assert archive.find(99) is None
+        assert archive.find(130) is None
+        number = archive.find(117)
+        assert number == 17
+        record = archive.game(number)
+        assert record.moves == records[17].moves
+        assert record.fleets == records[17].fleets
+        assert record.winner == records[17].winner
+        assert verify(record)
+        entry = archive.entry(number)
+        assert entry.game_id == 117 and entry.moves == len(records[17].moves) and entry.winner == records[17].winner
+        assert archive.game_by_id(5) is None
+
+
+def test_archive_scan(tmp_path, records):
+    path = str(tmp_path / "games.bsa")
+    build_archive(path, [(game_id * 2, record) for game_id, record in reversed(list(enumerate(records)))])
+    with GameArchive(path) as archive:
+        ids = [entry.game_id for entry in archive.entries()]
+        assert ids == sorted(ids)
+        won = list(archive.scan(winner=0))
+        assert len(won) == sum(record.winner == 0 for record in records)
+        short = list(archive.scan(max_moves=80))
+        assert all(entry.moves <= 80 for entry in short)
+        assert archive.game_by_id(8).moves == records[4].moves
+
+
+def test_record_messages(records):
+    messages = list(record_messages(records[0]))
+    assert messages[-1] == (1 - records[0].winner, "gameover")
+    assert messages[1][1] in ("hit", "missed")
+    loser = 1 - records[0].winner
+    assert sum(sender == loser and message.startswith("sunk") for sender, message in messages) == 10
+
+
+def test_not_an_archive(tmp_path):
+    path = tmp_path / "games.bsa"
+    path.write_bytes(b"BSRP\x01")
+    with pytest.raises(ArchiveException):
+        GameArchive(str(path))
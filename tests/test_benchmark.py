@@ -0,0 +1,15 @@
+from benchmark import BENCHMARKS, run_benchmarks, compare
+
+
+def test_all_benchmarks_run():
+    results = run_benchmarks(repeat=1, scale=0.01)
+    assert set(results) == set(BENCHMARKS)
+    assert all(result["us_per_op"] > 0 for result in results.values())
+
+
+def test_compare_with_baseline():
+    baseline = {"is_hit": {"ops": 100, "us_per_op": 1.0}, "bot_move": {"ops": 100, "us_per_op": 50.0}}
+    results = {"is_hit": {"ops": 100, "us_per_op": 1.2}, "bot_move": {"ops": 100, "us_per_op": 80.0},
+               "round_trip": {"ops": 100, "us_per_op": 30.0}}
+    assert compare(results, baseline) == [("bot_move", 50.0, 80.0, 1.6)]
+    assert compare(results, baseline, tolerance=0.1)[0][0] == "is_hit"
@@ -1,6 +1,10 @@
 import pytest
 from src.board import Board
-from src.board import SHIP_SYMBOL
+from src.board import SHIP_SYMBOL, PLACEMENT_MASKS, FLEET, generate_fleets
+from src.board import CELL_NAMES, COORDINATES, COORDINATE_CELLS, cell_index
+from src.board import TextRenderer, RENDERERS
+from src.board import get_single_coor, get_double_coor, check_single_coor, check_double_coor
+from src.board import geometry, parse_size, parse_fleet, random_fleet, row_label, BoardBaseException
 from src.board import CoordinatesValueException, ShipLengthException, ShipNeighPointsNotAvailableException
 
 def test_board_initialization():
@@ -25,23 +29,23 @@ def test_get_single_coor():
     x_axis = Board.y_coor_mapping.values()
     for y in y_axis:
         for x in x_axis:
-            row, col = Board.get_single_coor(f"{y}{x}")
+            row, col = get_single_coor(f"{y}{x}")
             assert row == Board.y_coor_mapping[y]
             assert col == x
 
 
 def test_get_single_coor_out_of_bounds_y():
     with pytest.raises(KeyError):
-        row, col = Board.get_single_coor("X10")
+        row, col = get_single_coor("X10")
 
 
 def test_get_single_coor_out_of_bounds_x():
     with pytest.raises(ValueError):
-        row, col = Board.get_single_coor("A11")
+        row, col = get_single_coor("A11")
 
 
 def test_get_double_coor():
-    start_row, start_col, end_row, end_col = Board.get_double_coor("A1 J10")
+    start_row, start_col, end_row, end_col = get_double_coor("A1 J10")
     assert start_row == 1
     assert start_col == 1
     assert end_row == 10
@@ -55,23 +59,23 @@ def test_insert_by_coor():
 
 def test_check_single_coor():
     with pytest.raises(CoordinatesValueException):
-        Board.check_single_coor("A11")
+        check_single_coor("A11")
 
     y_axis = Board.y_coor_mapping.keys()
     x_axis = Board.y_coor_mapping.values()
     for y in y_axis:
         for x in x_axis:
-            Board.check_single_coor(f"{y}{x}")
+            check_single_coor(f"{y}{x}")
 
 
 def test_check_double_coor():
     # with pytest.raises(CoordinatesValueException):
-    #     Board.check_double_coor("A1 A1")
+    #     check_double_coor("A1 A1")
     with pytest.raises(CoordinatesValueException):
-        Board.check_double_coor("A1 B2")
+        check_double_coor("A1 B2")
 
-    Board.check_double_coor("A1 A2")
-    Board.check_double_coor("A1 B1")
+    check_double_coor("A1 A2")
+    check_double_coor("A1 B1")
 
 
 def test_insert_by_coor():
@@ -197,4 +201,235 @@ def test_count_symbols():
     board = Board()
     board.insert_by_coor("C3")
     count = board.count_symbols()
-    assert count == 1
\ No newline at end of file
+    assert count == 1
+
+def test_board_view_cached_until_change():
+    board = Board()
+    lines = board.get_board_print_lines()
+    assert board.get_board_print_lines() is lines
+    board.insert_by_coor("A1")
+    lines = board.get_board_print_lines()
+    assert lines[3] == '| A | o | _ | _ | _ | _ | _ | _ | _ | _ | _  |'
+    assert board.board.get_string().split("\n") == lines
+
+
+def test_table_reflects_board_state():
+    board = Board()
+    board.insert_by_coor("B2")
+    board.insert_by_coor("B3", "M")
+    board.insert_by_coor("B4", "?")
+    assert board.is_hit("B2") is True
+    assert board.table[1][:5] == ["B", "_", "X", "M", "?"]
+    assert board.count_symbols("X") == 1
+    assert board.count_symbols("?") == 1
+    assert board.count_symbols("_") == 97
+
+
+def test_placement_masks():
+    ship, halo = PLACEMENT_MASKS[(2, 1, 1, "horizontal")]
+    assert ship == 0b11
+    assert halo == 0b111 | (0b111 << 10)
+    assert (4, 8, 1, "vertical") not in PLACEMENT_MASKS
+    assert len(PLACEMENT_MASKS) == 2 * sum(10 * (11 - length) for length in range(1, 11))
+
+
+def test_is_placement_available():
+    board = Board()
+    board.insert_by_coor("C3")
+    assert board.is_placement_available(4, 1, 1, "horizontal") is True
+    assert board.is_placement_available(4, 2, 1, "horizontal") is False
+    assert board.is_placement_available(2, 4, 4, "vertical") is False
+    assert board.is_placement_available(2, 5, 3, "vertical") is True
+    assert board.is_placement_available(4, 1, 8, "horizontal") is False
+
+
+def test_random_fleet_is_valid():
+    for fleet in generate_fleets(200, seed=7):
+        assert sorted(key[0] for key in fleet) == sorted(FLEET)
+        taken = 0
+        for key in fleet:
+            ship, halo = PLACEMENT_MASKS[key]
+            assert not halo & taken
+            taken |= ship
+    assert generate_fleets(5, seed=3) == generate_fleets(5, seed=3)
+    with pytest.raises(ShipLengthException):
+        generate_fleets(1, fleet=[11])
+
+
+def test_generate_fleets_in_batch():
+    pytest.importorskip("numpy")
+    for size, fleet in ((geometry(10, 10), FLEET), (geometry(5, 5), [3, 2, 2, 1, 1])):
+        fleets = generate_fleets(2000, seed=11, fleet=fleet, geometry=size)
+        assert len(fleets) == 2000
+        for placements in fleets:
+            assert [key[0] for key in placements] == fleet
+            taken = 0
+            for key in placements:
+                ship, halo = size.placement(key)
+                assert not halo & taken
+                taken |= ship
+        assert fleets == generate_fleets(2000, seed=11, fleet=fleet, geometry=size)
+    assert len(set(map(tuple, fleets))) > 100
+
+
+def test_init_ships_random():
+    board = Board()
+    assert board.init_ships("random") is True
+    assert board.count_symbols() == sum(FLEET)
+
+
+def test_init_ships_ready():
+    board = Board()
+    assert board.init_ships("ready") is True
+    assert board.count_symbols() == sum(FLEET)
+    board = Board(geometry(12, 12), [3, 3])
+    assert board.init_ships("ready") is True
+    assert board.ship_keys == [(3, 1, 1, "horizontal"), (3, 1, 5, "horizontal")]
+    with pytest.raises(ShipNeighPointsNotAvailableException):
+        Board(geometry(3, 3), [1, 1, 1, 1, 1]).init_ships("ready")
+
+
+def test_shoot_cell():
+    board = Board()
+    board.insert_by_coor("C3")
+    assert board.shoot_cell(21) is False
+    assert board.shoot_cell(22) is True
+    assert board.count_symbols() == 0
+    assert board.count_symbols("X") == 1
+
+
+def test_counters_follow_board_changes():
+    board = Board()
+    board.insert_ship((3, 1, 3, 2), 2)
+    board.insert_by_coor("J10", "M")
+    assert (board.ship_count, board.hit_count, board.miss_count) == (2, 0, 1)
+    board.is_hit("C1")
+    assert (board.ship_count, board.hit_count, board.miss_count) == (1, 1, 1)
+    board.insert_by_coor("J10")
+    assert (board.ship_count, board.hit_count, board.miss_count) == (2, 1, 0)
+
+
+def test_sunk_ship_detection():
+    board = Board()
+    board.insert_ship((1, 1, 3, 1), 3)
+    board.insert_ship((5, 5, 5, 5), 1)
+    assert board.ships_afloat == 2
+    assert board.is_hit("A1") is True
+    assert board.last_sunk is None
+    assert board.is_hit("B1") is True
+    assert board.is_hit("D1") is False
+    assert board.last_sunk is None
+    assert board.is_hit("C1") is True
+    assert board.last_sunk == (3, 1, 1, "vertical")
+    assert board.ship_health == [0, 1]
+    assert board.ships_afloat == 1
+    assert board.is_hit("E5") is True
+    assert board.last_sunk == (1, 5, 5, "horizontal")
+    assert board.ships_afloat == 0
+
+
+def test_coordinates_tables():
+    assert len(CELL_NAMES) == 100
+    assert Board.generate_all_fields_list() == CELL_NAMES
+    assert get_single_coor("b7") == (2, 7)
+    assert get_single_coor("A01") == (1, 1)
+    assert COORDINATE_CELLS["J10"] == 99
+    assert Board.reverse_coor_mapping(10) == "J"
+    for idx, name in enumerate(CELL_NAMES):
+        assert COORDINATE_CELLS[name] == cell_index(*COORDINATES[name]) == idx
+    with pytest.raises(CoordinatesValueException):
+        check_single_coor("K1")
+
+
+def test_text_renderer_matches_prettytable():
+    board = Board()
+    board.init_ships("random")
+    for idx in range(0, 100, 7):
+        board.shoot_cell(idx)
+    board.insert(3, 3, "#")
+    assert board.get_board_print_lines() == board.board.get_string().split("\n")
+
+
+def test_text_renderer_aligns_two_letter_rows():
+    board = Board(geometry(30, 30), [1])
+    lines = board.get_board_print_lines()
+    assert len({len(line) for line in lines}) == 1
+    assert lines[0].index("+", 1) == lines[1].index("|", 1) == lines[3].index("|", 1) == 5
+    assert lines[-2].startswith("| AD |")
+
+
+def test_text_renderer_redraws_dirty_rows_only():
+    rendered = []
+
+    class CountingRenderer(TextRenderer):
+        def render_row(self, board, row):
+            rendered.append(row)
+            return super(CountingRenderer, self).render_row(board, row)
+
+    board = Board()
+    board.set_renderer(CountingRenderer())
+    board.get_board_print_lines()
+    assert rendered == list(range(10))
+    rendered.clear()
+    board.insert_by_coor("C4", "X")
+    lines = board.get_board_print_lines()
+    assert rendered == [2]
+    assert lines[5] == "| C | _ | _ | _ | X | _ | _ | _ | _ | _ | _  |"
+
+
+def test_colour_renderer():
+    board = Board()
+    board.insert_by_coor("A1", "X")
+    board.set_renderer(RENDERERS["colour"])
+    line = board.get_board_print_lines()[3]
+    assert "\033[1;31mX\033[0m" in line
+    assert line.replace("\033[1;31m", "").replace("\033[0m", "") == "| A | X | _ | _ | _ | _ | _ | _ | _ | _ | _  |"
+
+
+def test_geometry_names_and_coordinates():
+    assert [row_label(row) for row in (1, 26, 27, 52, 100)] == ["A", "Z", "AA", "AZ", "CV"]
+    assert parse_size("15x20") == (15, 20) and parse_size("12") == (12, 12)
+    assert parse_fleet("5,4,3") == [5, 4, 3]
+    with pytest.raises(BoardBaseException):
+        geometry(101, 10)
+    board = Board(geometry(30, 20), [5, 4])
+    assert board.get_single_coor("AB12") == (28, 12)
+    assert board.get_double_coor("A20 D20") == (1, 20, 4, 20)
+    board.check_double_coor("AD1 AD5")
+    with pytest.raises(CoordinatesValueException):
+        board.check_single_coor("AE1")
+    with pytest.raises(CoordinatesValueException):
+        board.check_single_coor("A21")
+    # the standard board keeps its coordinates
+    with pytest.raises(CoordinatesValueException):
+        check_single_coor("K1")
+    with pytest.raises(CoordinatesValueException):
+        Board().check_single_coor("K1")
+    assert Board().get_double_coor("A1 J10") == get_double_coor("A1 J10") == (1, 1, 10, 10)
+
+
+def test_large_board_random_fleet_and_shots():
+    large = geometry(100, 100)
+    fleet = [6, 5, 5, 4, 4, 3, 3, 3, 2, 2, 1, 1]
+    board = Board(large, fleet)
+    board.init_ships("random")
+    assert board.ship_count == sum(fleet) and board.ships_afloat == len(fleet)
+    for key in board.ship_keys:
+        others = [large.placement(other)[0] for other in board.ship_keys if other != key]
+        assert not any(ship & large.placement(key)[1] for ship in others)
+    length, row, col, orientation = board.ship_keys[0]
+    for step in range(length):
+        row2, col2 = (row, col + step) if orientation == "horizontal" else (row + step, col)
+        assert board.is_hit(large.cell_names[large.cell_index(row2, col2)])
+    assert board.last_sunk == board.ship_keys[0]
+    assert len(board.get_board_print_lines()) == 100 + 4
+
+
+def test_random_fleet_on_rectangular_board():
+    rect = geometry(15, 20)
+    for placements in [random_fleet([5, 4, 3], occupied=0, geometry=rect) for _ in range(50)]:
+        board = Board(rect, [5, 4, 3])
+        board.place_fleet(placements)
+        assert board.ship_count == 12
+    with pytest.raises(ShipLengthException):
+        Board(geometry(3, 3), [4])
@@ -0,0 +1,68 @@
+import asyncio
+from broadcast import Broadcast, BroadcastReader
+
+
+class FakeTransport():
+    def __init__(self):
+        self.backlog = 0
+
+    def get_write_buffer_size(self):
+        return self.backlog
+
+
+class FakeWriter():
+    def __init__(self):
+        self.transport = FakeTransport()
+        self.chunks = []
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(data)
+
+    def is_closing(self):
+        return self.closed
+
+    def close(self):
+        self.closed = True
+
+
+def test_messages_coalesced_and_shared():
+    async def game():
+        broadcast = Broadcast()
+        spectators = [FakeWriter() for _ in range(3)]
+        for spectator in spectators:
+            broadcast.subscribe(spectator)
+        broadcast.publish(0, "A1")
+        broadcast.publish(1, "hit")
+        BroadcastReader(broadcast, 1).feed(b"sunk 1\n")
+        await asyncio.sleep(0)
+        return broadcast, spectators
+
+    broadcast, spectators = asyncio.run(game())
+    assert all(spectator.chunks == [b"0 A1\n1 hit\n1 sunk 1\n"] for spectator in spectators)
+    # a single encoded chunk is shared by all the spectators
+    assert len({id(spectator.chunks[0]) for spectator in spectators}) == 1
+
+
+def test_late_spectator_and_slow_consumer():
+    async def game():
+        broadcast = Broadcast(max_buffer=100)
+        fast, slow = FakeWriter(), FakeWriter()
+        broadcast.subscribe(fast)
+        broadcast.subscribe(slow)
+        broadcast.publish(0, "B2")
+        await asyncio.sleep(0)
+        slow.transport.backlog = 100
+        broadcast.publish(1, "missed")
+        await asyncio.sleep(0)
+        late = FakeWriter()
+        broadcast.subscribe(late)
+        broadcast.close()
+        return broadcast, fast, slow, late
+
+    broadcast, fast, slow, late = asyncio.run(game())
+    assert slow.closed and slow.chunks == [b"0 B2\n"]
+    assert broadcast.dropped == 1
+    assert b"".join(fast.chunks) == b"0 B2\n1 missed\n"
+    assert late.chunks == [b"0 B2\n1 missed\n"]
+    assert fast.closed and late.closed
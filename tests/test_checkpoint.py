@@ -0,0 +1,152 @@
+import board
+from checkpoint import Checkpoint, Snapshot, encode, decode, RECORD
+from player import Player
+from server import BotPlayer, quiet
+
+
+class QuietPlayer(Player):
+    def __init__(self, path):
+        super(QuietPlayer, self).__init__(log_method=quiet)
+        self.log_boards = False
+        self.checkpoint = Checkpoint(str(path))
+        self.finished = False
+
+    def display_prompt(self, actor="Me"):
+        pass
+
+    def display_boards(self):
+        pass
+
+    def end_game(self):
+        self.finished = True
+
+
+def deliver(sender, receiver):
+    """Pass the messages sent by one player to the other, saving the sender's game first like flush_messages()
+    """
+    sender.save_game()
+    for message in receiver.reader.feed(sender.writer.take()):
+        receiver.handle_received_msg(message)
+
+
+def drop(sender):
+    sender.save_game()
+    sender.writer.take()
+
+
+def shoot(player):
+    """Shoot at the first cell of the opponent's board which was not shot at yet
+    """
+    shot = player.opponent_board.hits | player.opponent_board.misses
+    idx = next(idx for idx in range(player.geometry.cells) if not shot & (1 << idx))
+    player.handle_user_action(player.geometry.cell_names[idx])
+
+
+def start(first, second):
+    first.your_turn, second.your_turn = True, False
+    first.start_game(init_ships_method="random")
+    second.start_game(init_ships_method="random")
+    deliver(first, second)
+    deliver(second, first)
+
+
+def test_snapshot_round_trip():
+    player_board = board.Board()
+    player_board.place_fleet(board.random_fleet())
+    player_board.is_hit("A1")
+    geometry = board.geometry(12, 15)
+    for snapshot in (Snapshot(7, board.DEFAULT_GEOMETRY, board.FLEET, True, player_board.ship_keys, player_board.hits,
+                              0b101, 0b1010, [(2, 1)], [99], 5, 4, ["hit", "sunk 1"]),
+                     Snapshot(2 ** 64 - 1, geometry, [5, 1], None, [(5, 12, 11, "horizontal"), (1, 1, 1, "vertical")],
+                              1 << 179, 0, 1 << 178, [], [], 0, 0, [])):
+        data = encode(snapshot)
+        restored = decode(data)
+        assert vars(restored) == vars(snapshot)
+    assert len(encode(Snapshot(1, board.DEFAULT_GEOMETRY, board.FLEET, False, player_board.ship_keys, 0, 0, 0))) <= 111
+
+
+def test_checkpoint_keeps_previous_snapshot(tmp_path):
+    path = tmp_path / "game.bsc"
+    saved = Checkpoint(str(path))
+    for number in range(3):
+        saved.save(Snapshot(number, board.DEFAULT_GEOMETRY, [1], False, [(1, 1, 1, "horizontal")], 0, 0, 0))
+    assert Checkpoint(str(path)).load().game_id == 2
+    # latest snapshot torn by a crash
+    data = bytearray(path.read_bytes())
+    data[saved.slot_size + RECORD.size] ^= 0xFF
+    path.write_bytes(bytes(data))
+    assert Checkpoint(str(path)).load().game_id == 1
+    saved.clear()
+    assert Checkpoint(str(path)).load() is None
+    assert Checkpoint(str(tmp_path / "missing.bsc")).load() is None
+
+
+def test_resume_sends_lost_messages_again(tmp_path):
+    first, second = QuietPlayer(tmp_path / "first"), QuietPlayer(tmp_path / "second")
+    start(first, second)
+    assert first.game_id is not None and first.game_id == second.game_id
+    # shot is answered, but the reply is lost together with both processes
+    shoot(first)
+    deliver(first, second)
+    drop(second)
+    ships = second.local_board.ship_keys
+
+    first, second = QuietPlayer(tmp_path / "first"), QuietPlayer(tmp_path / "second")
+    start(first, second)
+    assert second.local_board.ship_keys == ships
+    assert first.shots_known == 1 and not first.last_guess_stack
+    # then the shot itself is lost
+    if not first.your_turn:
+        first, second = second, first
+    shoot(first)
+    drop(first)
+    first.send_resume()
+    second.send_resume()
+    deliver(first, second)
+    deliver(second, first)
+    assert second.shots_answered == first.shots_known
+
+    # game goes on to its end, which forgets the saved games
+    while not (first.finished or second.finished):
+        shooter, target = (first, second) if first.your_turn else (second, first)
+        shoot(shooter)
+        deliver(shooter, target)
+        deliver(target, shooter)
+    assert first.checkpoint.load() is None and second.checkpoint.load() is None
+
+
+def test_bot_resumes_its_strategy(tmp_path):
+    bot = BotPlayer(log_method=quiet)
+    bot.log_boards = False
+    bot.display_prompt = quiet
+    bot.checkpoint = Checkpoint(str(tmp_path / "bot"))
+    opponent = QuietPlayer(tmp_path / "opponent")
+    start(opponent, bot)
+    for _ in range(30):
+        if bot.your_turn:
+            bot.daemon_response()
+            deliver(bot, opponent)
+            deliver(opponent, bot)
+        else:
+            shoot(opponent)
+            deliver(opponent, bot)
+            deliver(bot, opponent)
+    bot.save_game()
+    resumed = BotPlayer(log_method=quiet)
+    resumed.display_prompt = quiet
+    resumed.checkpoint = Checkpoint(str(tmp_path / "bot"))
+    resumed.start_game()
+    shots = [idx for idx in range(bot.geometry.cells) if bot.opponent_board.occupied & (1 << idx)]
+    assert resumed.opponent_board.occupied == bot.opponent_board.occupied
+    assert resumed.strategy.next_shot() not in shots
+
+
+def test_guess_in_other_form_is_saved(tmp_path):
+    first, second = QuietPlayer(tmp_path / "first"), QuietPlayer(tmp_path / "second")
+    start(first, second)
+    first.handle_user_action("b01")
+    assert first.last_guess_stack == ["B1"]
+    assert first.snapshot().pending == [first.geometry.cell_index(2, 1)]
+    deliver(first, second)
+    deliver(second, first)
+    assert first.opponent_board.occupied == 1 << first.geometry.cell_index(2, 1)
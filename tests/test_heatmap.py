@@ -0,0 +1,30 @@
+import random
+import pytest
+import heatmap
+
+
+def test_heatmap_python_counts_placements():
+    rows = heatmap.heatmap_python(0, {4: 1})
+    assert rows[0][0] == 2
+    assert rows[0][3] == 4 + 1
+    assert rows[4][4] == 8
+    blocked = 1 << 1
+    rows = heatmap.heatmap_python(blocked, {2: 1})
+    assert rows[0][0] == 1
+    assert rows[0][1] == 0
+
+
+def test_single_squares_counted_once():
+    rows = heatmap.heatmap_python(0, {1: 4})
+    assert all(value == 4 for row in rows for value in row)
+
+
+def test_numpy_engine_matches_python():
+    pytest.importorskip("numpy")
+    rng = random.Random(3)
+    masks = [rng.getrandbits(100) & rng.getrandbits(100) for _ in range(50)]
+    remaining = [{4: rng.randint(0, 1), 3: rng.randint(0, 2), 2: 3, 1: rng.randint(0, 4)} for _ in masks]
+    batch = heatmap.heatmaps(masks, remaining)
+    assert batch.shape == (50, 10, 10)
+    assert batch.tolist() == [heatmap.heatmap_python(mask, game) for mask, game in zip(masks, remaining)]
+    assert heatmap.heatmap(masks[0]).tolist() == heatmap.heatmap_python(masks[0], heatmap.remaining_fleet())
@@ -0,0 +1,60 @@
+from lobby import Lobby
+
+
+class Clock():
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_first_come_first_served():
+    clock = Clock()
+    lobby = Lobby(clock=clock)
+    assert lobby.join("a") is None
+    clock.now = 1.0
+    assert lobby.join("b") == "a"
+    assert lobby.join("c") is None
+    lobby.leave("c")
+    assert lobby.join("d") is None
+    assert len(lobby) == 1
+    stats = lobby.stats()
+    assert stats["paired"] == 1 and stats["max_wait"] == 1.0
+
+
+def test_rating_pairing():
+    lobby = Lobby(rating_window=100, clock=Clock())
+    assert lobby.join("a", 1000) is None
+    assert lobby.join("b", 1500) is None
+    assert lobby.join("unrated") is None
+    assert lobby.join("c", 1250) is None
+    assert lobby.join("d", 1420) == "b"
+    assert lobby.join("e", 1099) == "a"
+    assert lobby.join("f") == "unrated"
+    assert len(lobby) == 1
+
+
+def test_expire():
+    clock = Clock()
+    lobby = Lobby(rating_window=100, clock=clock)
+    for number, entry in enumerate("abcd"):
+        clock.now = number
+        lobby.join(entry, 1000 * number)
+    lobby.leave("b")
+    clock.now = 4.5
+    assert lobby.oldest() == 0
+    assert lobby.expire(2.0) == ["a", "c"]
+    assert lobby.oldest() == 3
+    assert lobby.stats()["expired"] == 2 and len(lobby) == 1
+
+
+def test_pools_are_separate():
+    lobby = Lobby(rating_window=100)
+    assert lobby.join("a", 1000, pool="10x10") is None
+    assert lobby.join("b", 1000, pool="12x12") is None
+    assert lobby.join("c", None, pool="12x12") is None
+    assert lobby.join("d", 1050, pool="12x12") == "b"
+    assert lobby.join("e", None, pool="10x10") is None
+    assert lobby.join("f", None, pool="12x12") == "c"
+    assert len(lobby) == 2
@@ -0,0 +1,52 @@
+import io
+import threading
+from logqueue import QueueLogger, stream_sink, at_level, ERROR, INFO, DEBUG
+
+
+def test_messages_written_in_order():
+    stream = io.StringIO()
+    log = QueueLogger(stream_sink(stream))
+    for number in range(500):
+        log(f"message {number}")
+    log.flush()
+    assert stream.getvalue().splitlines() == [f"message {number}" for number in range(500)]
+    log.close()
+
+
+def test_level_filtering():
+    stream = io.StringIO()
+    log = QueueLogger(stream_sink(stream), level=INFO)
+    log("debug", DEBUG)
+    log("info")
+    log("error", ERROR)
+    log.close()
+    assert stream.getvalue().splitlines() == ["info", "error"]
+
+
+def test_batching_and_dropping():
+    batches = []
+    release = threading.Event()
+
+    def sink(batch):
+        release.wait()
+        batches.append(batch)
+
+    log = QueueLogger(sink, batch_size=10, max_queue=20)
+    log("first")
+    for number in range(100):
+        log(number)
+    release.set()
+    log.close()
+    assert log.dropped > 0
+    assert all(len(batch) <= 10 for batch in batches)
+    assert sum(len(batch) for batch in batches) + log.dropped == 101
+
+
+def test_at_level():
+    stream = io.StringIO()
+    log = QueueLogger(stream_sink(stream), level=INFO)
+    at_level(log, DEBUG)("move")
+    at_level(log, ERROR)("failure")
+    log.close()
+    assert stream.getvalue() == "failure\n"
+    assert at_level(print, DEBUG) is print
@@ -0,0 +1,71 @@
+import random
+import pytest
+import board
+from openingbook import OpeningBook, BookCursor, BookException, build_book, result_code, ROOT, MISSED, HIT
+from server import BotPlayer, quiet
+
+pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def book_path(tmp_path):
+    path = str(tmp_path / "book.bob")
+    build_book(path, fleets=3000, depth=4, min_samples=50, seed=3)
+    return path
+
+
+def test_book_tree(book_path):
+    with OpeningBook(book_path) as book:
+        assert book.matches(board.DEFAULT_GEOMETRY, board.FLEET)
+        assert not book.matches(board.geometry(12, 12), board.FLEET)
+        assert book.node(ROOT)[3] == 3000
+        shots = []
+        node = ROOT
+        while node is not None:
+            shots.append(book.shot(node))
+            node = book.child(node, MISSED)
+        assert len(shots) == 4 and len(set(shots)) == 4
+        hit_child = book.child(ROOT, HIT)
+        assert hit_child is not None and book.shot(hit_child) not in (None, shots[0])
+        assert book.child(ROOT, result_code(True, 4)) is None
+
+
+def test_cursor_leaves_book(book_path):
+    with OpeningBook(book_path) as book:
+        cursor = BookCursor(book)
+        first = cursor.next_shot()
+        cursor.record(False)
+        assert cursor.next_shot() == book.shot(book.child(ROOT, MISSED))
+        cursor.record(True)
+        cursor.sunk(1)
+        cursor.sunk(1)
+        assert cursor.next_shot() is None and first is not None
+
+
+def test_bot_opens_from_book(book_path):
+    book = OpeningBook(book_path)
+    bot = BotPlayer(log_method=quiet)
+    bot.log_boards = False
+    bot.display_prompt = quiet
+    bot.opening_book = book
+    bot.initialize_game(init_ships_method="random")
+    target = board.Board()
+    target.place_fleet(board.random_fleet(rng=random.Random(1)))
+    shots = []
+    while target.ship_count:
+        guess = bot.daemon_response()
+        shots.append(guess)
+        hit = target.is_hit(guess)
+        bot.handle_received_msg("hit" if hit else "missed")
+        if target.last_sunk is not None:
+            bot.handle_received_msg(f"sunk {target.last_sunk[0]}")
+    assert shots[0] == board.CELL_NAMES[book.shot(ROOT)]
+    assert len(shots) == len(set(shots))
+    book.close()
+
+
+def test_not_a_book(tmp_path):
+    path = tmp_path / "empty.bob"
+    path.write_bytes(b"nothing here at all, really")
+    with pytest.raises(BookException):
+        OpeningBook(str(path)).open()
@@ -0,0 +1,73 @@
+import os
+import re
+import sys
+import time
+import signal
+import socket
+import threading
+import subprocess
+import board
+import protocol
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def play(port):
+    """Play against the bot, shooting at every cell in order and never being hit. Returns True if won.
+    """
+    with socket.create_connection(("127.0.0.1", port), timeout=10) as conn:
+        conn.sendall(b"hello 3\nready\n")
+        reader = protocol.MessageReader()
+        shots = iter(board.CELL_NAMES)
+        conn.sendall(f"{next(shots)}\n".encode())
+        while True:
+            messages = reader.recv(conn)
+            if messages is None:
+                return False
+            if "gameover" in messages:
+                return True
+            for message in messages:
+                if message == "hit":
+                    conn.sendall(f"{next(shots)}\n".encode())
+                elif message in board.COORDINATE_CELLS:
+                    conn.sendall(f"missed\n{next(shots)}\n".encode())
+
+
+def reports(lines):
+    return [line for line in lines if line.startswith("Bot pool:")]
+
+
+def test_pool_spreads_games_and_respawns_workers():
+    port = free_port()
+    process = subprocess.Popen([sys.executable, "-u", "pool.py", "-f", "-w", "2", "-p", str(port), "--bot-delay", "0",
+                                "--report-interval", "0.5"], cwd=SRC, stdout=subprocess.PIPE, text=True)
+    lines = []
+    threading.Thread(target=lambda: lines.extend(process.stdout), daemon=True).start()
+    try:
+        deadline = time.monotonic() + 10
+        while not reports(lines) and time.monotonic() < deadline:
+            time.sleep(0.1)
+        results = []
+        games = [threading.Thread(target=lambda: results.append(play(port))) for _ in range(8)]
+        for game in games:
+            game.start()
+        for game in games:
+            game.join()
+        assert results == [True] * 8
+        time.sleep(1.5)
+        load = re.findall(r"(\d+): (\d+) running/(\d+) played", reports(lines)[-1])
+        assert len(load) == 2 and sum(int(played) for pid, running, played in load) == 8
+
+        os.kill(int(load[0][0]), signal.SIGKILL)
+        time.sleep(1.5)
+        assert "1 respawned" in reports(lines)[-1]
+        assert play(port)
+    finally:
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=10) == 0
@@ -0,0 +1,109 @@
+import socket
+import pytest
+from src.protocol import MessageReader, MessageWriter, ProtocolException
+from src.protocol import hello_message, parse_hello, parse_rating, PROTOCOL_VERSION, CELL_NAMES, BINARY
+from src.protocol import sunk_message, parse_sunk, parse_board, parse_pace, parse_delay, parse_game, parse_resume
+
+
+def test_reader_handles_partial_and_coalesced_messages():
+    reader = MessageReader()
+    assert reader.feed(b"hi") == []
+    assert reader.feed(b"t\nmiss") == ["hit"]
+    assert reader.feed(b"ed\nA1\r\nB10\n\n") == ["missed", "A1", "B10"]
+    assert reader.buffer == bytearray()
+
+
+def test_reader_rejects_too_long_message():
+    reader = MessageReader(max_length=8)
+    with pytest.raises(ProtocolException):
+        reader.feed(b"A" * 9)
+
+
+def test_writer_batches_messages():
+    left, right = socket.socketpair()
+    writer = MessageWriter()
+    writer.write("hit")
+    writer.write("gameover")
+    writer.flush(left)
+    writer.flush(left)
+    left.close()
+    reader = MessageReader()
+    assert reader.recv(right) == ["hit", "gameover"]
+    assert reader.recv(right) is None
+    right.close()
+
+
+def test_hello():
+    assert parse_hello(hello_message()) == (PROTOCOL_VERSION, [])
+    assert parse_hello(hello_message(binary=True)) == (PROTOCOL_VERSION, ["binary"])
+    assert parse_hello("HELLO 3") == (3, [])
+    assert parse_hello("hello") is None
+    assert parse_hello("A1") is None
+    version, options = parse_hello(hello_message(binary=True, rating=1500))
+    assert BINARY in options and parse_rating(options) == 1500
+    assert parse_rating(["rating=x", "binary"]) is None
+
+
+def test_binary_messages():
+    writer = MessageWriter()
+    writer.binary = True
+    for message in ["hello 2 binary", "ready", "b7", "missed", "J10", "hit", "gameover"]:
+        writer.write(message)
+    data = writer.take()
+    assert data == b"hello 2 binary\n\xf3\x90\xf1\xe3\xf0\xf2"
+    reader = MessageReader()
+    assert reader.feed(data[:5]) == []
+    assert reader.feed(data[5:]) == ["hello 2 binary", "ready", "B7", "missed", "J10", "hit", "gameover"]
+
+
+def test_binary_shot_of_every_cell():
+    writer = MessageWriter()
+    writer.binary = True
+    for name in CELL_NAMES:
+        writer.write(name)
+    data = writer.take()
+    assert len(data) == 100
+    assert MessageReader().feed(data) == CELL_NAMES
+    with pytest.raises(ProtocolException):
+        MessageReader().feed(b"\xff")
+
+
+def test_sunk_messages():
+    assert parse_sunk(sunk_message(4)) == 4
+    assert parse_sunk("sunk") is None
+    writer = MessageWriter()
+    writer.binary = True
+    writer.write("hit")
+    writer.write(sunk_message(3))
+    data = writer.take()
+    assert data == b"\xf0\xf7"
+    assert MessageReader().feed(data) == ["hit", "sunk 3"]
+
+
+def test_board_options_in_handshake():
+    version, options = parse_hello(hello_message(binary=True, size=(12, 15), fleet=[5, 4, 3]))
+    assert parse_board(options) == ((12, 15), [5, 4, 3])
+    assert parse_board(parse_hello(hello_message())[1]) == (None, None)
+    with pytest.raises(ProtocolException):
+        parse_board(["board=12"])
+
+
+def test_pace_in_handshake():
+    assert parse_pace(parse_hello(hello_message(pace=(0.5, 2)))[1]) == (0.5, 2.0)
+    assert parse_pace(parse_hello(hello_message(pace=(0, 0)))[1]) == (0.0, 0.0)
+    assert parse_pace(parse_hello(hello_message())[1]) is None
+    assert parse_delay("3") == (3.0, 3.0)
+    with pytest.raises(ProtocolException):
+        parse_delay("3-1")
+
+
+def test_game_and_resume_in_handshake():
+    options = parse_hello(hello_message(game=0xBEEF))[1]
+    assert parse_game(options) == 0xBEEF and parse_resume(options) is None
+    options = parse_hello(hello_message(resume=(2 ** 64 - 1, 12, 11)))[1]
+    assert parse_resume(options) == (2 ** 64 - 1, 12, 11) and parse_game(options) is None
+    for value in ("resume=ff/1", "resume=zz/1/2", "resume=ff/-1/2"):
+        with pytest.raises(ProtocolException):
+            parse_resume([value])
+    with pytest.raises(ProtocolException):
+        parse_game(["game=xyz"])
@@ -0,0 +1,49 @@
+import pytest
+from replay import ReplayWriter, ReplayException, read_replays, parse_replays, boards_at, verify
+from simulator import simulate
+
+
+def test_simulated_games_replay(tmp_path):
+    path = str(tmp_path / "games.bsr")
+    stats = simulate(20, "density", "random", seed=2, replay=ReplayWriter(path))
+    records = read_replays(path)
+    assert len(records) == 20
+    assert all(verify(record) for record in records)
+    assert sum(record.winner == 0 for record in records) + sum(record.winner == 1 for record in records) == 20
+    first, second = boards_at(records[0])
+    assert first.ship_count == 0 or second.ship_count == 0
+    first, second = boards_at(records[0], 0)
+    assert first.ship_count == second.ship_count == 20
+
+
+def test_tampered_result_fails_verification(tmp_path):
+    path = str(tmp_path / "games.bsr")
+    simulate(1, seed=3, replay=ReplayWriter(path))
+    record = read_replays(path)[0]
+    shooter, idx, hit, sunk = record.moves[0]
+    record.moves[0] = (shooter, idx, not hit, sunk)
+    assert verify(record) is False
+
+
+def test_unknown_fleet_and_unfinished_game(tmp_path):
+    path = str(tmp_path / "games.bsr")
+    writer = ReplayWriter(path)
+    writer.start_game([[(2, 1, 1, "vertical")], None])
+    writer.move(1, 0, True)
+    writer.move(0, 55, False)
+    writer.move(1, 10, True)
+    writer.sunk(2)
+    writer.flush()
+    record = read_replays(path)[0]
+    assert record.fleets == [[(2, 1, 1, "vertical")], None]
+    assert record.moves == [(1, 0, True, 0), (0, 55, False, 0), (1, 10, True, 2)]
+    assert record.winner is None
+    assert verify(record)
+    mine, opponent = boards_at(record)
+    assert opponent.count_symbols("M") == 1
+    assert mine.count_symbols("X") == 2
+
+
+def test_not_a_replay():
+    with pytest.raises(ReplayException):
+        list(parse_replays(b"hello"))
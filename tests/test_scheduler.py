@@ -0,0 +1,52 @@
+from scheduler import Scheduler
+
+
+class Clock():
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_calls_run_in_deadline_order():
+    clock = Clock()
+    scheduler = Scheduler(clock)
+    calls = []
+    scheduler.call_later(2.0, calls.append, "b")
+    scheduler.call_later(1.0, calls.append, "a")
+    scheduler.call_later(2.0, calls.append, "c")
+    assert scheduler.next_timeout() == 1.0
+    assert scheduler.run_due() == 0
+    clock.now = 2.5
+    assert scheduler.next_timeout() == 0.0
+    assert scheduler.run_due() == 3
+    assert calls == ["a", "b", "c"]
+    assert scheduler.next_timeout() is None
+
+
+def test_cancelled_calls_are_skipped():
+    clock = Clock()
+    scheduler = Scheduler(clock)
+    calls = []
+    first = scheduler.call_later(1.0, calls.append, 1)
+    scheduler.call_later(3.0, calls.append, 3)
+    first.cancel()
+    assert len(scheduler) == 1
+    assert scheduler.next_timeout() == 3.0
+    clock.now = 5.0
+    scheduler.run_due()
+    assert calls == [3]
+
+
+def test_thousands_of_games_share_one_heap():
+    clock = Clock()
+    scheduler = Scheduler(clock)
+    replies = []
+    for game in range(5000):
+        scheduler.call_later(1.0 + (game % 7) * 0.25, replies.append, game)
+    clock.now = 1.1
+    assert scheduler.run_due() == len([game for game in range(5000) if game % 7 == 0])
+    clock.now = 3.0
+    scheduler.run_due()
+    assert sorted(replies) == list(range(5000))
@@ -0,0 +1,59 @@
+import io
+import re
+from board import Board
+from screen import Screen
+
+ESCAPE = re.compile(r"\033\[(\d*);?(\d*)([HJr])|\0337|\0338|\n")
+
+
+def apply(output, grid):
+    """Apply the screen output onto the grid of characters, handling the escapes used by Screen
+    """
+    row, col, pos = 1, 1, 0
+    for match in ESCAPE.finditer(output):
+        for char in output[pos:match.start()]:
+            grid.setdefault(row, {})[col] = char
+            col += 1
+        pos = match.end()
+        if match.group(3) == "H":
+            row, col = int(match.group(1) or 1), int(match.group(2) or 1)
+        elif match.group(3) == "J":
+            grid.clear()
+    for char in output[pos:]:
+        grid.setdefault(row, {})[col] = char
+        col += 1
+    return grid
+
+
+def text(grid, rows):
+    return ["".join(grid.get(row, {}).get(col, " ") for col in range(1, 100)).rstrip() for row in rows]
+
+
+def test_update_writes_changed_cells_only():
+    player, opponent = Board(), Board()
+    player.init_ships("random")
+    stream = io.StringIO()
+    screen = Screen([("PLAYER", player), ("OPPONENT", opponent)], stream)
+    screen.draw()
+    grid = apply(stream.getvalue(), dict())
+    stream.truncate(0)
+    stream.seek(0)
+    screen.update()
+    assert stream.getvalue() == ""
+
+    for idx in (0, 11, 55, 99):
+        if not player.shoot_cell(idx):
+            player.set_cells(1 << idx, "M")
+    opponent.insert_by_coor("J10", "M")
+    screen.update()
+    update = stream.getvalue()
+    assert update.count("\033[") == 5
+    apply(update, grid)
+
+    expected = io.StringIO()
+    fresh = Screen([("PLAYER", player), ("OPPONENT", opponent)], expected)
+    fresh.draw()
+    rows = range(1, screen.height + 1)
+    assert text(grid, rows) == text(apply(expected.getvalue(), dict()), rows)
+    screen.close()
+    fresh.close()
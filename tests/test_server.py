@@ -0,0 +1,125 @@
+import socket
+import asyncio
+import board
+import protocol
+from server import AsyncServer, quiet
+
+
+def start_server(**options):
+    """AsyncServer serving on a free loopback port, as (server, its task, port)
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(16)
+    server = AsyncServer(port=sock.getsockname()[1], log_method=quiet, stats_interval=0, sock=sock, **options)
+    return server, asyncio.create_task(server.serve()), sock.getsockname()[1]
+
+
+async def until(condition, timeout=2.0):
+    async def poll():
+        while not condition():
+            await asyncio.sleep(0.01)
+    await asyncio.wait_for(poll(), timeout)
+
+
+async def read_messages(reader, count):
+    """Read at least count messages from the server
+    """
+    messages, protocol_reader = [], protocol.MessageReader()
+    while len(messages) < count:
+        data = await asyncio.wait_for(reader.read(protocol.RECV_BUFFER), 5)
+        assert data, f"connection closed after {messages}"
+        messages += protocol_reader.feed(data)
+    return messages
+
+
+def test_client_leaving_lobby_is_not_paired():
+    async def game():
+        server, serving, port = start_server(pair_timeout=30)
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"hello 3 rating=1\nready\n")
+        await writer.drain()
+        await until(lambda: len(server.lobby))
+        writer.close()
+        await until(lambda: not len(server.lobby))
+
+        first_reader, first_writer = await asyncio.open_connection("127.0.0.1", port)
+        first_writer.write(b"hello 3 rating=2\nready\n")
+        await first_writer.drain()
+        await until(lambda: len(server.lobby))
+        second_reader, second_writer = await asyncio.open_connection("127.0.0.1", port)
+        second_writer.write(b"hello 3 rating=3\n")
+        await second_writer.drain()
+        # data sent while waiting in the lobby is passed on too
+        second_messages = await read_messages(second_reader, 3)
+        first_messages = await read_messages(first_reader, 1)
+        for stream in (first_writer, second_writer):
+            stream.close()
+        serving.cancel()
+        return first_messages, second_messages
+
+    first_messages, second_messages = asyncio.run(game())
+    assert second_messages == ["wait", "hello 3 rating=2", "ready"]
+    assert first_messages == ["hello 3 rating=3"]
+
+
+def test_match_relays_both_ways():
+    async def game():
+        server, serving, port = start_server(pair_timeout=30)
+        first_reader, first_writer = await asyncio.open_connection("127.0.0.1", port)
+        first_writer.write(b"hello 3\nready\n")
+        await first_writer.drain()
+        await until(lambda: len(server.lobby))
+        second_reader, second_writer = await asyncio.open_connection("127.0.0.1", port)
+        second_writer.write(b"hello 3\nready\n")
+        await second_writer.drain()
+        second_messages = await read_messages(second_reader, 3)
+        first_messages = await read_messages(first_reader, 2)
+        await until(lambda: server.games_running == 1)
+
+        first_writer.write(b"A1\n")
+        second_messages += await read_messages(second_reader, 1)
+        second_writer.write(b"missed\nB2\n")
+        first_messages += await read_messages(first_reader, 2)
+        first_writer.close()
+        # the game ends for the other client too
+        assert await asyncio.wait_for(second_reader.read(), 5) == b""
+        await until(lambda: server.games_running == 0)
+        serving.cancel()
+        return first_messages, second_messages, server.games_played
+
+    first_messages, second_messages, played = asyncio.run(game())
+    assert second_messages == ["wait", "hello 3", "ready", "A1"]
+    assert first_messages == ["hello 3", "ready", "missed", "B2"]
+    assert played == 1
+
+
+def test_bot_game_runs_to_gameover():
+    async def game():
+        server, serving, port = start_server(pair_timeout=0, bot_delay=None)
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"hello 3\nready\n")
+        shots = iter(board.CELL_NAMES)
+        writer.write(f"{next(shots)}\n".encode())
+        protocol_reader = protocol.MessageReader()
+        bot_shots = 0
+        while True:
+            data = await asyncio.wait_for(reader.read(protocol.RECV_BUFFER), 5)
+            assert data, "bot closed the connection before the game was over"
+            messages = protocol_reader.feed(data)
+            if "gameover" in messages:
+                break
+            for message in messages:
+                if message == "hit":
+                    writer.write(f"{next(shots)}\n".encode())
+                elif message in board.COORDINATE_CELLS:
+                    # never hit, so the client wins
+                    bot_shots += 1
+                    writer.write(f"missed\n{next(shots)}\n".encode())
+            await writer.drain()
+        writer.close()
+        await until(lambda: server.games_played == 1)
+        serving.cancel()
+        return bot_shots
+
+    assert asyncio.run(game()) > 0
@@ -0,0 +1,17 @@
+import random
+from simulator import play_game, simulate
+from strategy import RandomStrategy
+
+
+def test_play_game():
+    rng = random.Random(1)
+    winner, shots = play_game([RandomStrategy(rng), RandomStrategy(rng)], rng)
+    assert winner in (0, 1)
+    assert 20 <= shots <= 100
+
+
+def test_simulate_is_reproducible():
+    stats = simulate(50, seed=5)
+    assert stats["games"] == 50
+    assert sum(stats["wins"]) == 50
+    assert stats == simulate(50, seed=5)
@@ -0,0 +1,68 @@
+import random
+import pytest
+import board
+from strategy import STRATEGIES, Strategy, DensityStrategy, HuntTargetStrategy
+
+
+@pytest.mark.parametrize("name", sorted(STRATEGIES))
+def test_strategy_sinks_fleet_without_repeating_shots(name):
+    rng = random.Random(11)
+    for _ in range(20):
+        target = board.Board()
+        target.place_fleet(board.random_fleet(rng=rng))
+        strategy = STRATEGIES[name](rng)
+        shots = set()
+        while target.ships:
+            idx = strategy.next_shot()
+            assert idx not in shots
+            shots.add(idx)
+            strategy.record(idx, target.shoot_cell(idx))
+        assert len(shots) <= 100
+
+
+def test_strategy_without_next_shot_cannot_be_created():
+    class Idle(Strategy):
+        pass
+
+    with pytest.raises(TypeError):
+        Idle()
+
+
+def test_hunt_target_follows_hit():
+    strategy = HuntTargetStrategy(random.Random(1))
+    strategy.record(board.cell_index(5, 5), True)
+    assert strategy.next_shot() in (board.cell_index(4, 5), board.cell_index(6, 5),
+                                    board.cell_index(5, 4), board.cell_index(5, 6))
+    assert strategy.known[board.cell_index(4, 4)] == 1
+
+
+def test_density_targets_around_hit():
+    strategy = DensityStrategy(random.Random(1))
+    strategy.record(board.cell_index(1, 1), True)
+    assert strategy.next_shot() in (board.cell_index(1, 2), board.cell_index(2, 1))
+    strategy.record(board.cell_index(1, 2), False)
+    assert strategy.next_shot() == board.cell_index(2, 1)
+
+
+def test_density_after_sunk_ship():
+    strategy = DensityStrategy(random.Random(1))
+    strategy.record(board.cell_index(1, 1), True, sunk=1)
+    assert strategy.remaining[1] == 3
+    assert not strategy.hits
+    assert strategy.next_shot() not in (board.cell_index(1, 2), board.cell_index(2, 1), board.cell_index(2, 2))
+
+
+@pytest.mark.parametrize("name", sorted(STRATEGIES))
+def test_strategy_on_rectangular_board(name):
+    rng = random.Random(5)
+    geometry, fleet = board.geometry(12, 15), [5, 4, 3, 3, 2]
+    target = board.Board(geometry, fleet)
+    target.place_fleet(board.random_fleet(fleet, rng, geometry=geometry))
+    strategy = STRATEGIES[name](rng, fleet, geometry)
+    shots = set()
+    while target.ships:
+        idx = strategy.next_shot()
+        assert idx not in shots and 0 <= idx < geometry.cells
+        shots.add(idx)
+        hit = target.shoot_cell(idx)
+        strategy.record(idx, hit, target.last_sunk[0] if target.last_sunk else None)
@@ -0,0 +1,22 @@
+from tournament import plan_shards, run_tournament, wilson_interval
+
+
+def test_wilson_interval():
+    low, high = wilson_interval(50, 100)
+    assert 0.40 < low < 0.5 < high < 0.60
+    assert wilson_interval(0, 0) == (0.0, 0.0)
+
+
+def test_plan_shards():
+    shards = plan_shards(["random", "random"], 12, shard_size=5, seed=1)
+    assert [shard[0] for shard in shards] == [5, 5, 2]
+    assert len(set(shard[3] for shard in shards)) == 3
+    assert plan_shards(["random"], 3, seed=None) == [(3, "random", "random", None)]
+
+
+def test_run_tournament_is_deterministic():
+    first = run_tournament(["random", "random"], 40, workers=2, shard_size=10, seed=7)
+    second = run_tournament(["random", "random"], 40, workers=1, shard_size=10, seed=7)
+    assert first.games == {"random": 80}
+    assert first.wins == second.wins
+    assert first.shots_to_win == second.shots_to_win